@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ProjectConfig(AppConfig):
+    name = "config"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from config.metrics import connection_opened
+        from config.renditions import connect_signals
+
+        connect_signals()
+        connection_created.connect(connection_opened, dispatch_uid="metrics:db")
@@ -0,0 +1,79 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from config.instrumentation import record_cache_call
+
+_MISSING = object()
+_in_call = ContextVar("cache_in_call", default=False)
+
+
+@contextmanager
+def _tracked():
+    """
+    Учитывает только внешний вызов: реализации get_many/get_or_set
+    внутри бэкенда могут вызывать get/add повторно
+    """
+    if _in_call.get():
+        yield None
+        return
+    token = _in_call.set(True)
+    call = {"hits": 0, "misses": 0}
+    started = time.perf_counter()
+    try:
+        yield call
+    finally:
+        _in_call.reset(token)
+        record_cache_call(time.perf_counter() - started, **call)
+
+
+def _timed(name):
+    def method(self, *args, **kwargs):
+        with _tracked():
+            return getattr(super(InstrumentedCacheMixin, self), name)(*args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+class InstrumentedCacheMixin:
+    """
+    Подсчет обращений к кэшу, попаданий и промахов для текущего запроса
+    """
+
+    def get(self, key, default=None, version=None):
+        with _tracked() as call:
+            value = super().get(key, _MISSING, version)
+            if call is not None:
+                call["hits" if value is not _MISSING else "misses"] += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with _tracked() as call:
+            values = super().get_many(keys, version)
+            if call is not None:
+                call["hits"] += len(values)
+                call["misses"] += len(keys) - len(values)
+        return values
+
+    set = _timed("set")
+    add = _timed("add")
+    delete = _timed("delete")
+    set_many = _timed("set_many")
+    delete_many = _timed("delete_many")
+    get_or_set = _timed("get_or_set")
+    incr = _timed("incr")
+    touch = _timed("touch")
+    has_key = _timed("has_key")
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
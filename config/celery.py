@@ -1,6 +1,14 @@
 import os
 
 from celery import Celery
+from celery.signals import (
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+)
+
+from config import metrics
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
@@ -14,4 +22,10 @@ app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Load task modules from all registered Django apps.
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+# Metrics of task duration and failures for the /metrics endpoint.
+task_prerun.connect(metrics.task_started)
+task_postrun.connect(metrics.task_finished)
+task_failure.connect(metrics.task_failed)
+worker_process_shutdown.connect(metrics.process_shutdown)
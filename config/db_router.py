@@ -0,0 +1,142 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY_PIN_KEY = "db:primary:{user_id}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_state = ContextVar("db_routing", default=None)
+
+
+class RoutingState:
+    """
+    Маршрутизация текущего запроса: можно ли читать с реплик
+    и была ли в запросе запись
+    """
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+@contextmanager
+def routing(use_replicas):
+    """
+    Чтения внутри блока при use_replicas идут на реплики
+    """
+    state = RoutingState(use_replicas)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def pin_to_primary(user_id):
+    """
+    Чтения пользователя REPLICA_STICKY_SECONDS секунд идут на основную базу,
+    чтобы он сразу видел результат своей записи
+    """
+    cache.set(
+        PRIMARY_PIN_KEY.format(user_id=user_id), True, settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    return cache.get(PRIMARY_PIN_KEY.format(user_id=user_id)) is not None
+
+
+def get_user_id(request):
+    """
+    Id пользователя запроса без обращения к базе: из JWT-токена
+    или из cookie-сессии
+    """
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from rest_framework_simplejwt.settings import api_settings
+
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    if header is not None:
+        raw_token = auth.get_raw_token(header)
+        if raw_token is None:
+            return None
+        try:
+            return auth.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM]
+        except (InvalidToken, TokenError, KeyError):
+            return None
+
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return request.session.get(SESSION_KEY)
+    return None
+
+
+class ReplicaRouter:
+    """
+    Запись и миграции идут в основную базу, безопасные чтения внутри
+    HTTP-запросов GET/HEAD/OPTIONS - на случайную из READ_REPLICAS.
+
+    На основную базу остаются чтения в транзакциях, чтения после записи
+    в том же запросе, чтения пользователя в течение REPLICA_STICKY_SECONDS
+    после его записи и все чтения вне HTTP-запросов (задачи Celery,
+    команды), которым важна согласованность.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.use_replicas
+            or not settings.READ_REPLICAS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.READ_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.use_replicas = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.READ_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Включает чтение с реплик для безопасных запросов пользователей,
+    которые недавно ничего не записывали, и закрепляет пользователя
+    за основной базой после записи
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas = bool(settings.READ_REPLICAS) and request.method in SAFE_METHODS
+        if use_replicas:
+            user_id = get_user_id(request)
+            use_replicas = user_id is None or not is_pinned(user_id)
+
+        with routing(use_replicas) as state:
+            response = self.get_response(request)
+
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
@@ -0,0 +1,78 @@
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+from config.metrics import CACHE_REQUESTS
+
+_current_stats = ContextVar("request_stats", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Представление выполнило больше SQL-запросов, чем разрешено его бюджетом
+    """
+
+
+class RequestStats:
+    """
+    Счетчики одного запроса: SQL-запросы, время в базе и обращения к кэшу
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_calls = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Обертка выполнения SQL для connection.execute_wrapper
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def current_stats():
+    """
+    Счетчики текущего запроса или None вне инструментированного запроса
+    """
+    return _current_stats.get()
+
+
+@contextmanager
+def collect_stats():
+    """
+    Собирает статистику SQL-запросов по всем базам и обращений к кэшу
+    внутри блока
+    """
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def record_cache_call(duration, hits=0, misses=0):
+    if hits:
+        CACHE_REQUESTS.inc(hits, result="hit")
+    if misses:
+        CACHE_REQUESTS.inc(misses, result="miss")
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.cache_calls += 1
+        stats.cache_time += duration
+        stats.cache_hits += hits
+        stats.cache_misses += misses
@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+
+class RateLimiter:
+    """
+    Token bucket: не больше rate сообщений в секунду с запасом burst.
+    Когда токены закончились, acquire() ждет (backpressure), а не отбрасывает
+    сообщение. rate=0 отключает ограничение.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Забирает токен, при необходимости дожидаясь его
+        :return: сколько секунд пришлось ждать
+        """
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class ConnectionPool:
+    """
+    Открытые SMTP-соединения процесса, сгруппированные по серверу и логину.
+    После fork дочерний процесс начинает с пустого пула: сокеты родителя
+    не переиспользуются.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.queues = {}
+
+    def get_queue(self, key):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            if key not in self.queues:
+                self.queues[key] = queue.LifoQueue(maxsize=settings.EMAIL_POOL_SIZE)
+            return self.queues[key]
+
+    def take(self, key):
+        try:
+            return self.get_queue(key).get_nowait()
+        except queue.Empty:
+            return None
+
+    def put(self, key, connection):
+        """
+        Возвращает соединение в пул
+        :return: False, если пул полон и соединение нужно закрыть
+        """
+        try:
+            self.get_queue(key).put_nowait(connection)
+        except queue.Full:
+            return False
+        return True
+
+    def clear(self):
+        with self.lock:
+            queues, self.queues = self.queues, {}
+        for connections in queues.values():
+            while not connections.empty():
+                try:
+                    connections.get_nowait().quit()
+                except Exception:
+                    pass
+
+
+pool = ConnectionPool()
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    Ограничитель скорости текущего процесса
+    """
+    key = (os.getpid(), settings.EMAIL_RATE_LIMIT)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(settings.EMAIL_RATE_LIMIT)
+        return _limiters[key]
+
+
+class PooledSMTPEmailBackend(EmailBackend):
+    """
+    SMTP-бэкенд с пулом постоянных соединений и ограничением скорости.
+
+    Соединение берется из пула процесса (EMAIL_POOL_SIZE соединений на сервер),
+    перед использованием проверяется командой NOOP (оборванные сервером
+    соединения отбрасываются) и после отправки пачки
+    возвращается в пул вместо QUIT, поэтому SSL-рукопожатие и логин
+    выполняются один раз на воркер. Перед каждым письмом забирается токен
+    ограничителя EMAIL_RATE_LIMIT писем в секунду на процесс: при превышении
+    отправка ждет, а не получает отказ провайдера.
+    """
+
+    def pool_key(self):
+        return (
+            self.host,
+            int(self.port),
+            self.username,
+            self.use_ssl,
+            self.use_tls,
+        )
+
+    def open(self):
+        if self.connection:
+            return False
+
+        while True:
+            connection = pool.take(self.pool_key())
+            if connection is None:
+                break
+            if self.is_alive(connection):
+                self.connection = connection
+                return True
+            self.discard(connection)
+
+        return super().open()
+
+    def close(self):
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        if not pool.put(self.pool_key(), connection):
+            self.connection = connection
+            super().close()
+
+    def _send(self, email_message):
+        get_limiter().acquire()
+        return super()._send(email_message)
+
+    @staticmethod
+    def is_alive(connection):
+        try:
+            return connection.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
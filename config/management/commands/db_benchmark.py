@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand
+from django.db import connections
+
+from materials.models import Lesson
+
+
+class Command(BaseCommand):
+    """
+    Пропускная способность типичного запроса к базе без переиспользования
+    соединений (новое соединение на каждую операцию, как при CONN_MAX_AGE=0)
+    и с постоянными соединениями. Для замера через HTTP запустите loadtest
+    против сервера с DB_CONN_MAX_AGE=0 и с включенным пулом.
+    """
+
+    help = "Сравнение запросов в секунду с пулом соединений и без"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--operations", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=4)
+
+    def handle(self, *args, **options):
+        results = {}
+        for pooled in (False, True):
+            results[pooled] = self.run(
+                options["database"], options["operations"], options["threads"], pooled
+            )
+            mode = "с пулом" if pooled else "без пула"
+            self.stdout.write(f"{mode:>9}: {results[pooled]:>9.1f} операций/с")
+
+        if results[False]:
+            self.stdout.write(f"Ускорение: x{results[True] / results[False]:.1f}")
+
+    def run(self, alias, operations, threads, pooled):
+        per_thread = max(1, operations // threads)
+
+        def worker():
+            connection = connections[alias]
+            try:
+                for _ in range(per_thread):
+                    if not pooled:
+                        connection.close()
+                    Lesson.objects.using(alias).filter(pk=0).exists()
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(worker) for _ in range(threads)]:
+                future.result()
+        return per_thread * threads / (time.perf_counter() - started)
@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand
+from django.db import connections
+
+from config.metrics import store
+
+
+class Command(BaseCommand):
+    """
+    Статистика пула соединений: настройки переиспользования соединений
+    Django, количество открытых соединений по данным /metrics и, с флагом
+    --pgbouncer, пулы PgBouncer (SHOW POOLS / SHOW STATS).
+    """
+
+    help = "Статистика пула соединений с базой"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--pgbouncer", action="store_true", help="Запросить статистику у PgBouncer"
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options["database"]].settings_dict
+        self.stdout.write(f"База {options['database']}:")
+        for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS", "DISABLE_SERVER_SIDE_CURSORS"):
+            self.stdout.write(f"  {key} = {settings_dict.get(key)}")
+
+        counters, _ = store.collect()
+        for (name, labels), value in sorted(counters.items()):
+            if name == "db_connections_opened_total":
+                self.stdout.write(f"  открыто соединений {dict(labels)}: {value}")
+
+        if options["pgbouncer"]:
+            self.pgbouncer_stats(settings_dict)
+
+    def pgbouncer_stats(self, settings_dict):
+        import psycopg2
+
+        admin = psycopg2.connect(
+            dbname="pgbouncer",
+            user=settings_dict["USER"],
+            password=settings_dict["PASSWORD"],
+            host=settings_dict["HOST"],
+            port=settings_dict["PORT"],
+        )
+        admin.autocommit = True
+        try:
+            with admin.cursor() as cursor:
+                for command in ("SHOW POOLS", "SHOW STATS"):
+                    cursor.execute(command)
+                    columns = [column.name for column in cursor.description]
+                    self.stdout.write("")
+                    self.stdout.write(command)
+                    for row in cursor.fetchall():
+                        self.stdout.write(
+                            "  " + ", ".join(f"{c}={v}" for c, v in zip(columns, row))
+                        )
+        finally:
+            admin.close()
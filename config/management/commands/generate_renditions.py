@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+
+from config.renditions import RENDITION_FIELDS, is_rendered, render
+from config.tasks import generate_renditions
+
+
+class Command(BaseCommand):
+    """
+    Строит уменьшенные копии для уже загруженных изображений курсов,
+    уроков и аватаров. По умолчанию задачи ставятся в очередь Celery,
+    с --sync копии строятся в текущем процессе.
+    """
+
+    help = "Построение копий изображений для существующих файлов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model", choices=list(RENDITION_FIELDS), help="Только для этой модели"
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Перестроить уже готовые копии"
+        )
+        parser.add_argument("--sync", action="store_true", help="Без очереди Celery")
+
+    def handle(self, *args, **options):
+        labels = [options["model"]] if options["model"] else list(RENDITION_FIELDS)
+        for label in labels:
+            field = RENDITION_FIELDS[label]
+            queryset = (
+                apps.get_model(label)
+                .objects.exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .only("pk", field)
+                .order_by("pk")
+            )
+
+            processed = 0
+            for instance in queryset.iterator():
+                fieldfile = getattr(instance, field)
+                if not options["force"] and is_rendered(fieldfile):
+                    continue
+                if options["sync"]:
+                    render(fieldfile, force=options["force"])
+                else:
+                    generate_renditions.delay(label, instance.pk, force=options["force"])
+                processed += 1
+
+            self.stdout.write(f"{label}: изображений {processed}")
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from config.schema import build_schema, code_version
+
+
+class Command(BaseCommand):
+    """
+    Генерация схемы OpenAPI для текущей версии кода при сборке или деплое.
+    Схема сохраняется в Redis, откуда ее берут все процессы приложения.
+    """
+
+    help = "Генерация и кэширование схемы OpenAPI"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Дополнительно сохранить схему в файл")
+        parser.add_argument("--format", choices=("json", "yaml"), default="json")
+
+    def handle(self, *args, **options):
+        schemas = {fmt: build_schema(fmt) for fmt in ("json", "yaml")}
+        self.stdout.write(f"Схема версии {code_version()} сохранена в кэш")
+
+        if options["output"]:
+            with open(options["output"], "wb") as f:
+                f.write(schemas[options["format"]]["content"])
+            self.stdout.write(f"Схема записана в {options['output']}")
@@ -0,0 +1,274 @@
+import json
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from statistics import mean
+
+import requests
+from django.core.management import BaseCommand, CommandError
+from django.urls import reverse
+
+from materials.models import Course, Lesson, Subscription
+from users.models import Payments, User
+
+EMAIL_DOMAIN = "loadtest.local"
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(values, percent):
+    """
+    Перцентиль по методу ближайшего ранга (values отсортирован)
+    """
+    if not values:
+        return None
+    rank = math.ceil(percent / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест реальных маршрутов materials.urls и users.urls
+    против локально запущенного сервера.
+
+    Сервер запускается с LOADTEST=1 (заглушки Stripe и почты, заголовок
+    Server-Timing с количеством SQL-запросов), данные готовятся командой
+    generate_data. Для каждого эндпоинта считаются пропускная способность,
+    перцентили задержки p50/p95/p99 и количество SQL-запросов на запрос,
+    результат сохраняется в JSON для сравнения прогонов.
+    """
+
+    help = "Нагрузочный тест API против локального сервера"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Запросов на эндпоинт"
+        )
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--users", type=int, default=20, help="Сколько пользователей авторизовать"
+        )
+        parser.add_argument("--password", default="loadtest")
+        parser.add_argument(
+            "--endpoint", action="append", help="Запустить только указанные эндпоинты"
+        )
+        parser.add_argument(
+            "--writes",
+            action="store_true",
+            help="Включить изменяющие эндпоинты (создание платежа, подписка)",
+        )
+        parser.add_argument("--output", help="Файл для результатов в JSON")
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        self.base_url = options["base_url"].rstrip("/")
+        self.timeout = options["timeout"]
+        self.local = threading.local()
+
+        sessions = self.login(options["users"], options["password"])
+        endpoints = self.endpoints(options["writes"])
+        if options["endpoint"]:
+            endpoints = [e for e in endpoints if e[0] in options["endpoint"]]
+
+        results = {}
+        for name, method, build in endpoints:
+            calls = [
+                build(sessions[i % len(sessions)]) for i in range(options["requests"])
+            ]
+            warmup = [
+                build(sessions[i % len(sessions)]) for i in range(options["warmup"])
+            ]
+            self.run(method, warmup, options["concurrency"])
+            results[name] = self.run(method, calls, options["concurrency"])
+            self.report(name, results[name])
+
+        payload = {
+            "meta": {
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "base_url": self.base_url,
+                "concurrency": options["concurrency"],
+                "requests_per_endpoint": options["requests"],
+                "dataset": {
+                    "users": User.objects.count(),
+                    "courses": Course.objects.count(),
+                    "lessons": Lesson.objects.count(),
+                    "subscriptions": Subscription.objects.count(),
+                    "payments": Payments.objects.count(),
+                },
+            },
+            "endpoints": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=2, sort_keys=True, ensure_ascii=False)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+    def login(self, count, password):
+        """
+        Получение JWT-токенов для сгенерированных пользователей
+        :return: список словарей с токеном и объектами пользователя
+        """
+        users = list(
+            User.objects.filter(
+                email__startswith="user",
+                email__endswith=f"@{EMAIL_DOMAIN}",
+                pk__in=Lesson.objects.values("owner"),
+            ).order_by("pk")[:count]
+        )
+        if not users:
+            raise CommandError(
+                "Нет тестовых пользователей с курсами, запустите generate_data"
+            )
+
+        sessions = []
+        for user in users:
+            response = requests.post(
+                self.base_url + reverse("users:login"),
+                json={"email": user.email, "password": password},
+                timeout=self.timeout,
+            )
+            if response.status_code != 200:
+                raise CommandError(
+                    f"Не удалось авторизовать {user.email}: {response.text}"
+                )
+            sessions.append(
+                {
+                    "user": user,
+                    "headers": {"Authorization": f"Bearer {response.json()['access']}"},
+                    "course": Course.objects.filter(owner=user).order_by("pk").first(),
+                    "lesson": Lesson.objects.filter(owner=user).order_by("pk").first(),
+                    "any_course": Course.objects.order_by("?").first(),
+                }
+            )
+        return sessions
+
+    def endpoints(self, writes):
+        """
+        Эндпоинты теста: имя маршрута, HTTP-метод и построитель запроса
+        (url, заголовки, тело) для конкретного пользователя
+        """
+
+        def get(url_name, arg=None):
+            def build(session):
+                args = None if arg is None else (arg(session),)
+                return reverse(url_name, args=args), session["headers"], None
+
+            return build
+
+        def owned(key):
+            def resolve(session):
+                obj = session[key]
+                if obj is None:
+                    raise CommandError(f"У {session['user']} нет объекта {key}")
+                return obj.pk
+
+            return resolve
+
+        endpoints = [
+            ("materials:course-list", "get", get("materials:course-list")),
+            (
+                "materials:course-detail",
+                "get",
+                get("materials:course-detail", owned("course")),
+            ),
+            ("materials:lesson_list", "get", get("materials:lesson_list")),
+            (
+                "materials:lesson_detail",
+                "get",
+                get("materials:lesson_detail", owned("lesson")),
+            ),
+            ("users:users_list", "get", get("users:users_list")),
+            (
+                "users:users_detail",
+                "get",
+                get("users:users_detail", lambda s: s["user"].pk),
+            ),
+            ("users:payment_list", "get", get("users:payment_list")),
+        ]
+        if writes:
+            endpoints += [
+                (
+                    "users:payment_create",
+                    "post",
+                    lambda s: (
+                        reverse("users:payment_create"),
+                        s["headers"],
+                        {
+                            "user": s["user"].pk,
+                            "paid_course": s["any_course"].pk,
+                            "payment_count": 1000,
+                            "payment_method": "Оплата картой",
+                        },
+                    ),
+                ),
+                (
+                    "materials:subscription",
+                    "post",
+                    lambda s: (
+                        reverse("materials:subscription-detail", args=("create",)),
+                        s["headers"],
+                        {"course_id": s["any_course"].pk},
+                    ),
+                ),
+            ]
+        return endpoints
+
+    def request(self, method, call):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+
+        url, headers, body = call
+        started = time.perf_counter()
+        try:
+            response = session.request(
+                method,
+                self.base_url + url,
+                headers=headers,
+                json=body,
+                timeout=self.timeout,
+            )
+        except requests.RequestException:
+            return (time.perf_counter() - started) * 1000, None, None
+        elapsed = (time.perf_counter() - started) * 1000
+        queries = SERVER_TIMING_QUERIES.search(
+            response.headers.get("Server-Timing", "")
+        )
+        return elapsed, response.status_code, int(queries[1]) if queries else None
+
+    def run(self, method, calls, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(lambda call: self.request(method, call), calls))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        statuses = [sample[1] for sample in samples]
+        queries = [sample[2] for sample in samples if sample[2] is not None]
+        return {
+            "requests": len(samples),
+            "errors": sum(1 for status in statuses if status is None or status >= 400),
+            "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+            "latency_ms": {
+                "mean": round(mean(latencies), 2) if latencies else None,
+                "p50": round(percentile(latencies, 50), 2) if latencies else None,
+                "p95": round(percentile(latencies, 95), 2) if latencies else None,
+                "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            },
+            "queries_per_request": {
+                "mean": round(mean(queries), 2) if queries else None,
+                "max": max(queries) if queries else None,
+            },
+        }
+
+    def report(self, name, result):
+        latency = result["latency_ms"]
+        self.stdout.write(
+            f"{name:<28} {result['throughput_rps']:>8} rps  "
+            f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  "
+            f"queries={result['queries_per_request']['mean']}  errors={result['errors']}"
+        )
@@ -0,0 +1,76 @@
+import json
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from config.profiling import list_profiles
+
+
+class Command(BaseCommand):
+    """
+    Сводка самых горячих функций по сохраненным профилям запросов:
+    собственное и суммарное время для профилей cProfile и доля семплов
+    для профилей стек-семплера.
+    """
+
+    help = "Топ горячих функций по профилям из PROFILING_DIR"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=settings.PROFILING_DIR)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--view", help="Только профили представлений с этим именем")
+
+    def handle(self, *args, **options):
+        profiles = list_profiles(options["dir"])
+        if options["view"]:
+            view = options["view"].replace(":", ".")
+            profiles = [p for p in profiles if f"-{view}-" in p.name]
+
+        prof_files = [str(p) for p in profiles if p.name.endswith(".prof")]
+        sample_files = [p for p in profiles if p.name.endswith(".samples.json")]
+        if not profiles:
+            self.stdout.write("Профили не найдены")
+            return
+
+        if prof_files:
+            self.report_cprofile(prof_files, options["limit"])
+        if sample_files:
+            self.report_samples(sample_files, options["limit"])
+
+    def report_cprofile(self, files, limit):
+        stats = pstats.Stats(*files)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+
+        self.stdout.write(f"cProfile: профилей {len(files)}, время в секундах")
+        self.stdout.write(f"{'вызовов':>10} {'собств.':>10} {'суммарн.':>10}  функция")
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:limit]:
+            self.stdout.write(
+                f"{calls:>10} {tottime:>10.4f} {cumtime:>10.4f}  {filename}:{line}({name})"
+            )
+
+    def report_samples(self, files, limit):
+        own = Counter()
+        total = Counter()
+        samples = 0
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for entry in data["samples"]:
+                stack, count = entry["stack"], entry["count"]
+                samples += count
+                if stack:
+                    own[stack[-1]] += count
+                for frame in set(stack):
+                    total[frame] += count
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"Семплер стеков: профилей {len(files)}, семплов {samples}, доля семплов"
+        )
+        self.stdout.write(f"{'собств.':>8} {'суммарн.':>8}  функция")
+        for frame, count in own.most_common(limit):
+            self.stdout.write(
+                f"{count / samples:>8.1%} {total[frame] / samples:>8.1%}  {frame}"
+            )
@@ -0,0 +1,114 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from statistics import median
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from config.management.commands.loadtest import percentile
+
+# Тяжелые модули, которые не должны загружаться при старте процесса
+LAZY_MODULES = ("stripe", "drf_yasg.views", "drf_yasg.generators", "PIL.Image")
+
+PHASES = ("setup", "urls", "first_request", "total")
+
+SNIPPET = """
+import json, sys, time
+
+started = time.perf_counter()
+import django
+
+django.setup()
+setup = time.perf_counter()
+
+from django.urls import get_resolver
+
+get_resolver().url_patterns
+urls = time.perf_counter()
+
+from django.test import Client
+
+response = Client(HTTP_HOST="localhost").get(sys.argv[1])
+first_request = time.perf_counter()
+
+print(json.dumps({
+    "setup": setup - started,
+    "urls": urls - setup,
+    "first_request": first_request - urls,
+    "total": first_request - started,
+    "status": response.status_code,
+    "modules": len(sys.modules),
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+class Command(BaseCommand):
+    """
+    Замер времени запуска процесса: django.setup(), загрузка URL-конфигурации
+    и первый запрос. Каждый прогон выполняется в новом интерпретаторе,
+    результат сохраняется в JSON для отслеживания между версиями.
+    """
+
+    help = "Замер времени запуска процесса приложения"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--path", default="/materials/lesson/")
+        parser.add_argument("--output", help="Файл для сохранения результатов в JSON")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+        runs = []
+        for _ in range(options["runs"]):
+            result = subprocess.run(
+                [sys.executable, "-c", SNIPPET, options["path"], *LAZY_MODULES],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode:
+                raise CommandError(result.stderr.strip().splitlines()[-1])
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        summary = {}
+        for phase in PHASES:
+            values = sorted(run[phase] * 1000 for run in runs)
+            summary[phase] = {
+                "median_ms": round(median(values), 1),
+                "min_ms": round(values[0], 1),
+                "p95_ms": round(percentile(values, 95), 1),
+            }
+            self.stdout.write(
+                f"{phase:>14}: медиана {summary[phase]['median_ms']:>8} мс, "
+                f"мин {summary[phase]['min_ms']:>8} мс"
+            )
+
+        loaded = sorted({name for run in runs for name in run["loaded"]})
+        self.stdout.write(f"Модулей загружено: {runs[-1]['modules']}")
+        if loaded:
+            self.stdout.write(
+                self.style.WARNING(f"Загружены при старте: {', '.join(loaded)}")
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "started_at": datetime.now(timezone.utc).isoformat(),
+                        "path": options["path"],
+                        "summary": summary,
+                        "eagerly_loaded": loaded,
+                        "runs": runs,
+                    },
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                    sort_keys=True,
+                )
@@ -0,0 +1,165 @@
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+CHUNK_SIZE = 64 * 1024
+
+
+def file_hash(path, stat=None):
+    """
+    Короткий хеш содержимого файла. Хеш кэшируется по имени, размеру
+    и времени изменения, поэтому файл читается один раз на версию.
+    """
+    stat = stat or os.stat(path)
+    name = hashlib.md5(path.encode()).hexdigest()
+    key = f"media:hash:{name}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()[:16]
+        cache.set(key, digest, None)
+    return digest
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Хранилище медиафайлов, которое добавляет к ссылке хеш содержимого
+    (?v=<хеш>). Ссылка меняется вместе с файлом, поэтому serve_media отдает
+    ее с бессрочным Cache-Control: immutable.
+    """
+
+    def url(self, name):
+        url = super().url(name)
+        try:
+            return f"{url}?v={file_hash(self.path(name))}"
+        except OSError:
+            return url
+
+
+def parse_range(header, size):
+    """
+    Диапазон байт из заголовка Range.
+    Поддерживается один диапазон, списки диапазонов отдаются целым файлом.
+    :return: (start, end) включительно, None - отдать файл целиком,
+    False - диапазон вне файла
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if not length:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    """
+    Отдача медиафайлов с поддержкой Range, условных запросов
+    (If-None-Match, If-Modified-Since, If-Range) и кэширования.
+
+    Ссылки с актуальным ?v=<хеш> кэшируются клиентом и прокси навсегда,
+    остальные перепроверяются по ETag. При MEDIA_ACCEL_REDIRECT="nginx"
+    или "sendfile" передача файла отдается фронт-прокси через
+    X-Accel-Redirect или X-Sendfile, и воркер не копирует байты сам.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404("Файл не найден")
+    if not os.path.isfile(full_path):
+        raise Http404("Файл не найден")
+
+    digest = file_hash(full_path, stat)
+    etag = quote_etag(digest)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = build_response(request, path, full_path, stat.st_size, etag)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = (
+        IMMUTABLE_CACHE_CONTROL
+        if request.GET.get("v") == digest
+        else REVALIDATE_CACHE_CONTROL
+    )
+    return response
+
+
+def build_response(request, path, full_path, size, etag):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    accel = settings.MEDIA_ACCEL_REDIRECT
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        if accel == "nginx":
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        else:
+            response["X-Sendfile"] = full_path
+        return response
+
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and (if_range is None or if_range == etag):
+        byte_range = parse_range(request.headers["Range"], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
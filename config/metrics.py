@@ -0,0 +1,347 @@
+import atexit
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+RETIRED_FILE = "retired.json"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class MetricStore:
+    """
+    Значения метрик процесса.
+
+    В мультипроцессном режиме (задан METRICS_DIR) фоновый поток процесса
+    раз в METRICS_FLUSH_INTERVAL секунд атомарно сохраняет изменившиеся
+    значения в файл <хост>-<pid>.json, а если изменений нет - обновляет
+    время изменения файла. Последние значения сохраняются и при выходе
+    процесса. При сборе значения всех файлов каталога суммируются, а файлы,
+    не обновлявшиеся дольше METRICS_STALE_AFTER секунд (процесс завершился),
+    переносятся в retired.json, чтобы суммы счетчиков не уменьшались.
+    После fork дочерний процесс начинает со своих собственных нулей.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        atexit.register(self.flush)
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.counters = {}
+        self.histograms = {}
+        self.dirty = False
+        self.flusher = None
+
+    @property
+    def filename(self):
+        return f"{socket.gethostname()}-{self.pid}.json"
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.check_pid()
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self.changed()
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self.lock:
+            self.check_pid()
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": [0] * (len(buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            histogram["buckets"][bisect_left(buckets, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            self.changed()
+
+    def check_pid(self):
+        if self.pid != os.getpid():
+            self.reset()
+
+    def changed(self):
+        self.dirty = True
+        if self.flusher is None and settings.METRICS_DIR:
+            self.flusher = threading.Thread(
+                target=self.run_flusher, name="metrics-flusher", daemon=True
+            )
+            self.flusher.start()
+
+    def run_flusher(self):
+        while self.flusher is threading.current_thread():
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """
+        Сохраняет значения процесса в его файл или, если они не менялись,
+        отмечает, что процесс жив
+        """
+        directory = settings.METRICS_DIR
+        if not directory or self.pid != os.getpid():
+            return
+        path = os.path.join(directory, self.filename)
+        with self.lock:
+            if not self.dirty:
+                if self.counters or self.histograms:
+                    try:
+                        os.utime(path)
+                    except FileNotFoundError:
+                        self.dirty = True
+                if not self.dirty:
+                    return
+            self.dirty = False
+            snapshot = self.dump()
+        write_snapshot(path, snapshot)
+
+    def dump(self):
+        return {
+            "counters": [
+                [name, labels, value] for (name, labels), value in self.counters.items()
+            ],
+            "histograms": [
+                [name, labels, histogram]
+                for (name, labels), histogram in self.histograms.items()
+            ],
+        }
+
+    def collect(self):
+        """
+        Суммарные значения по всем процессам
+        """
+        with self.lock:
+            self.check_pid()
+            snapshots = [self.dump()]
+
+        directory = settings.METRICS_DIR
+        if directory and os.path.isdir(directory):
+            self.flush()
+            snapshots = list(retire_stale(directory, keep=self.filename).values())
+        return merge(snapshots)
+
+
+def write_snapshot(path, snapshot):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_snapshot(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def retire_stale(directory, keep):
+    """
+    Переносит значения завершившихся процессов в retired.json
+    и удаляет их файлы. Сборщики разных процессов не мешают друг другу
+    благодаря блокировке каталога.
+    :return: словарь {имя файла: значения} оставшихся файлов
+    """
+    deadline = time.time() - settings.METRICS_STALE_AFTER
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        snapshots, stale = {}, []
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(directory, name)
+            snapshot = read_snapshot(path)
+            if snapshot is None:
+                continue
+            try:
+                is_stale = os.path.getmtime(path) < deadline
+            except OSError:
+                continue
+            if is_stale and name not in (keep, RETIRED_FILE):
+                stale.append((path, snapshot))
+            else:
+                snapshots[name] = snapshot
+
+        if stale:
+            counters, histograms = merge(
+                [snapshots.get(RETIRED_FILE, {})] + [snapshot for _, snapshot in stale]
+            )
+            snapshots[RETIRED_FILE] = {
+                "counters": [
+                    [name, labels, value] for (name, labels), value in counters.items()
+                ],
+                "histograms": [
+                    [name, labels, histogram]
+                    for (name, labels), histogram in histograms.items()
+                ],
+            }
+            write_snapshot(
+                os.path.join(directory, RETIRED_FILE), snapshots[RETIRED_FILE]
+            )
+            for path, _ in stale:
+                os.remove(path)
+    return snapshots
+
+
+def merge(snapshots):
+    """
+    Сумма значений метрик из нескольких снимков
+    :return: (счетчики, гистограммы)
+    """
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get("counters", ()):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in snapshot.get("histograms", ()):
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(
+                key,
+                {
+                    "buckets": [0] * len(histogram["buckets"]),
+                    "sum": 0.0,
+                    "count": 0,
+                },
+            )
+            total["buckets"] = [
+                a + b for a, b in zip(total["buckets"], histogram["buckets"])
+            ]
+            total["sum"] += histogram["sum"]
+            total["count"] += histogram["count"]
+    return counters, histograms
+
+
+store = MetricStore()
+REGISTRY = {}
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.kind = "counter"
+        REGISTRY[name] = self
+
+    def inc(self, amount=1, **labels):
+        store.inc(self.name, tuple(sorted(labels.items())), amount)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.kind = "histogram"
+        self.buckets = tuple(buckets)
+        REGISTRY[name] = self
+
+    def observe(self, value, **labels):
+        store.observe(self.name, tuple(sorted(labels.items())), value, self.buckets)
+
+
+def format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in items
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def generate_latest():
+    """
+    Метрики всех процессов в текстовом формате Prometheus
+    """
+    counters, histograms = store.collect()
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        if metric.kind == "counter":
+            for (metric_name, labels), value in sorted(counters.items()):
+                if metric_name == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+            continue
+
+        for (metric_name, labels), histogram in sorted(histograms.items()):
+            if metric_name != name:
+                continue
+            cumulative = 0
+            bounds = [str(bound) for bound in metric.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram["buckets"]):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{format_labels(labels, le=bound)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "Количество HTTP-запросов")
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса"
+)
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Количество SQL-запросов на HTTP-запрос",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Обращения к кэшу на чтение")
+DB_CONNECTIONS = Counter(
+    "db_connections_opened_total", "Открытые процессом соединения с базой"
+)
+CELERY_TASKS = Counter("celery_tasks_total", "Выполненные задачи Celery")
+CELERY_TASK_FAILURES = Counter("celery_task_failures_total", "Упавшие задачи Celery")
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Время выполнения задачи Celery"
+)
+
+_task_started = {}
+
+
+def task_started(task_id=None, **kwargs):
+    """
+    Обработчики сигналов Celery: длительность, результат и падения задач
+    """
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.observe(time.perf_counter() - started, task=task.name)
+    CELERY_TASKS.inc(task=task.name, state=state or "UNKNOWN")
+
+
+def task_failed(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.inc(task=sender.name)
+
+
+def process_shutdown(**kwargs):
+    """
+    Дочерние процессы воркера завершаются без atexit,
+    поэтому последние значения сохраняются по сигналу Celery
+    """
+    store.flush()
+
+
+def connection_opened(sender=None, connection=None, **kwargs):
+    """
+    Обработчик connection_created: при работающем пуле соединения
+    открываются редко, рост счетчика вместе с запросами означает,
+    что соединения не переиспользуются
+    """
+    DB_CONNECTIONS.inc(alias=connection.alias)
@@ -0,0 +1,164 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from config.instrumentation import QueryBudgetExceeded, collect_stats
+from config.metrics import HTTP_DB_QUERIES, HTTP_LATENCY, HTTP_REQUESTS
+from config.profiling import StackSampler, profile_path, prune_profiles, save_samples
+
+logger = logging.getLogger("config.requests")
+
+
+def get_query_budget(view_func, method):
+    """
+    Бюджет SQL-запросов представления: атрибут query_budget класса,
+    число или словарь {действие ViewSet: число}
+    """
+    budget = getattr(getattr(view_func, "cls", None), "query_budget", None)
+    if isinstance(budget, dict):
+        actions = getattr(view_func, "actions", None) or {}
+        budget = budget.get(actions.get(method.lower()))
+    return budget
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Считает для каждого запроса SQL-запросы, время в базе, обращения к кэшу
+    и время работы представления. Метрики пишутся в лог config.requests
+    (запросы дольше SLOW_REQUEST_THRESHOLD_MS - с уровнем WARNING,
+    остальные - DEBUG), в счетчики /metrics и (при SERVER_TIMING_HEADER)
+    в заголовок Server-Timing.
+
+    Если представление превысило свой query_budget, в тестах
+    (QUERY_BUDGET_STRICT) выбрасывается QueryBudgetExceeded, иначе
+    в лог пишется предупреждение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with collect_stats() as stats:
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        view_started = getattr(request, "_view_started", finished)
+        match = getattr(request, "resolver_match", None)
+        metrics = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": stats.queries,
+            "db_ms": round(stats.db_time * 1000, 2),
+            "cache_calls": stats.cache_calls,
+            "cache_hits": stats.cache_hits,
+            "cache_ms": round(stats.cache_time * 1000, 2),
+            "view_ms": round((finished - view_started) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2),
+        }
+        slow = metrics["total_ms"] >= settings.SLOW_REQUEST_THRESHOLD_MS
+        level = logging.WARNING if slow else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(metrics, ensure_ascii=False))
+
+        view = metrics["view"] or "<unresolved>"
+        HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        HTTP_LATENCY.observe(finished - started, view=view)
+        HTTP_DB_QUERIES.observe(stats.queries, view=view)
+
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = (
+                f'db;dur={metrics["db_ms"]};desc="{stats.queries} queries", '
+                f'cache;dur={metrics["cache_ms"]};desc="{stats.cache_calls} calls", '
+                f'view;dur={metrics["view_ms"]}, total;dur={metrics["total_ms"]}'
+            )
+
+        budget = getattr(request, "_query_budget", None)
+        if budget is not None and stats.queries > budget:
+            message = (
+                f"{metrics['view']}: {stats.queries} SQL-запросов "
+                f"при бюджете {budget}"
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_query_budget(view_func, request.method)
+        request._view_started = time.perf_counter()
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов (включается PROFILING_ENABLED).
+
+    Доля запросов PROFILING_SAMPLE_RATE целиком проходит под cProfile,
+    остальные наблюдаются стек-семплером, и если запрос оказался дольше
+    PROFILING_SLOW_THRESHOLD_MS, его семплы сохраняются. Профили пишутся
+    в PROFILING_DIR с именем представления и id запроса, хранится не больше
+    PROFILING_MAX_FILES файлов. Сводку строит команда profile_report.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = StackSampler(settings.PROFILING_INTERVAL_MS / 1000)
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+
+    def __call__(self, request):
+        request_id = self.get_request_id(request)
+
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            profiler.dump_stats(self.path(request, request_id, ".prof"))
+            prune_profiles(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+        else:
+            started = time.perf_counter()
+            with self.sampler.watch() as samples:
+                response = self.get_response(request)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if elapsed_ms >= settings.PROFILING_SLOW_THRESHOLD_MS:
+                match = getattr(request, "resolver_match", None)
+                save_samples(
+                    self.path(request, request_id, ".samples.json"),
+                    samples,
+                    view=match.view_name if match else None,
+                    request_id=request_id,
+                    path=request.path,
+                    elapsed_ms=round(elapsed_ms, 2),
+                    interval_ms=settings.PROFILING_INTERVAL_MS,
+                )
+                prune_profiles(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+
+        response["X-Request-ID"] = request_id
+        return response
+
+    @staticmethod
+    def get_request_id(request):
+        request_id = re.sub(r"[^\w-]", "", request.headers.get("X-Request-ID", ""))
+        return request_id[:64] or uuid.uuid4().hex
+
+    @staticmethod
+    def path(request, request_id, suffix):
+        match = getattr(request, "resolver_match", None)
+        return profile_path(
+            settings.PROFILING_DIR,
+            match.view_name if match else None,
+            request_id,
+            suffix,
+        )
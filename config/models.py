@@ -0,0 +1,90 @@
+from django.db.models.fields.files import FieldFile
+
+
+class DirtyFieldsMixin:
+    """
+    Отслеживание измененных полей модели.
+
+    При загрузке из базы и после каждого сохранения запоминаются значения
+    столбцов. save() без update_fields записывает только изменившиеся поля,
+    а если ничего не изменилось - не обращается к базе и не отправляет
+    сигналы. После сохранения changed_fields - имена записанных полей
+    (пустое множество, если запись пропущена), previous_values - их значения
+    столбцов до сохранения, чтобы побочные действия запускались только
+    для значимых изменений.
+    """
+
+    changed_fields = frozenset()
+    previous_values = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values()
+        return instance
+
+    def _current_values(self):
+        """
+        Значения загруженных столбцов, отложенные (defer, only) пропускаются
+        """
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                values[field.name] = (
+                    value.name if isinstance(value, FieldFile) else value
+                )
+        return values
+
+    def get_dirty_fields(self):
+        """
+        Поля, значения которых отличаются от сохраненных в базе.
+        Для нового объекта - все загруженные поля.
+        """
+        saved = getattr(self, "_saved_values", None)
+        current = self._current_values()
+        if self._state.adding or saved is None:
+            return set(current)
+        return {
+            name
+            for name, value in current.items()
+            if name not in saved or saved[name] != value
+        }
+
+    def save(self, *args, **kwargs):
+        dirty = self.get_dirty_fields()
+        if not self._state.adding:
+            dirty.discard(self._meta.pk.name)
+            if kwargs.get("update_fields") is None:
+                if not dirty:
+                    self.changed_fields = frozenset()
+                    self.previous_values = {}
+                    return
+                kwargs["update_fields"] = dirty
+            else:
+                dirty &= set(kwargs["update_fields"])
+
+        saved = getattr(self, "_saved_values", {})
+        self.previous_values = {name: saved.get(name) for name in dirty}
+        self.changed_fields = frozenset(dirty)
+        super().save(*args, **kwargs)
+        self._remember_values(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember_values(fields)
+
+    def _remember_values(self, fields=None):
+        """
+        Запоминает текущие значения полей fields (имена или attname)
+        или всех загруженных полей как сохраненные в базе
+        """
+        current = self._current_values()
+        if fields is not None:
+            names = {
+                field.name
+                for field in self._meta.concrete_fields
+                if field.name in fields or field.attname in fields
+            }
+            current = {name: value for name, value in current.items() if name in names}
+        self._saved_values = {**getattr(self, "_saved_values", {}), **current}
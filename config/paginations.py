@@ -0,0 +1,33 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк запроса по статистике планировщика PostgreSQL
+    (EXPLAIN без выполнения запроса)
+    :return: число строк или None для других баз
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор списков админки для больших таблиц: вместо точного COUNT(*)
+    берет оценку планировщика, если она больше ADMIN_ESTIMATED_COUNT_THRESHOLD.
+    Небольшие выборки и базы без статистики считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
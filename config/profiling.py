@@ -0,0 +1,116 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_SUFFIXES = (".prof", ".samples.json")
+
+
+class StackSampler:
+    """
+    Низкозатратный семплер стеков: один фоновый поток раз в interval секунд
+    снимает стеки зарегистрированных потоков через sys._current_frames().
+    Поток спит, пока нет наблюдаемых запросов.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.watched = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    @contextmanager
+    def watch(self):
+        """
+        Семплирует стеки текущего потока внутри блока
+        :return: Counter {стек: количество семплов}
+        """
+        samples = Counter()
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.watched[thread_id] = samples
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="stack-sampler", daemon=True
+                )
+                self.thread.start()
+        self.wakeup.set()
+        try:
+            yield samples
+        finally:
+            with self.lock:
+                self.watched.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                watched = dict(self.watched)
+                if not watched:
+                    self.wakeup.clear()
+            if not watched:
+                self.wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id, samples in watched.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[self.stack(frame)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def stack(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_filename}:{code.co_firstlineno}({code.co_name})")
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+
+def profile_path(directory, view_name, request_id, suffix):
+    """
+    Путь к файлу профиля: время, имя представления и id запроса
+    """
+    view = re.sub(r"[^\w.-]+", ".", view_name or "unknown")
+    return Path(directory) / f"{int(time.time() * 1000)}-{view}-{request_id}{suffix}"
+
+
+def save_samples(filename, samples, **meta):
+    data = dict(
+        meta,
+        samples=[
+            {"stack": list(stack), "count": count}
+            for stack, count in samples.most_common()
+        ],
+    )
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def list_profiles(directory):
+    """
+    Сохраненные профили в порядке создания
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        Path(directory) / name
+        for name in os.listdir(directory)
+        if name.endswith(PROFILE_SUFFIXES)
+    )
+
+
+def prune_profiles(directory, max_files):
+    """
+    Удаляет самые старые профили сверх max_files
+    """
+    profiles = list_profiles(directory)
+    for path in profiles[: max(0, len(profiles) - max_files)]:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,38 @@
+def delete_in_batches(queryset, batch_size, progress=None):
+    """
+    Удаляет строки запроса пачками по первичному ключу: на пачку один
+    DELETE без загрузки объектов, сигналов и каскада на стороне Python,
+    поэтому зависимые строки вызывающий код удаляет раньше. Каждая пачка -
+    отдельный короткий запрос, блокировки не копятся до конца очистки.
+    :param progress: вызывается с количеством строк после каждой пачки
+    :return: количество удаленных строк
+    """
+    manager = queryset.model._base_manager
+    deleted = 0
+    while True:
+        batch = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        count = manager.filter(pk__in=batch)._raw_delete(queryset.db)
+        deleted += count
+        if progress is not None:
+            progress(count)
+
+
+def update_in_batches(queryset, batch_size, progress=None, **values):
+    """
+    Обновляет строки запроса пачками по первичному ключу. Запрос должен
+    отбирать только еще не обновленные строки, иначе цикл не закончится.
+    :param progress: вызывается с количеством строк после каждой пачки
+    :return: количество обновленных строк
+    """
+    manager = queryset.model._base_manager
+    updated = 0
+    while True:
+        batch = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return updated
+        count = manager.filter(pk__in=batch).update(**values)
+        updated += count
+        if progress is not None:
+            progress(count)
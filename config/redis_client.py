@@ -0,0 +1,13 @@
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """
+    Общий клиент Redis процесса (пул соединений создается один раз)
+    """
+    import redis
+
+    return redis.Redis.from_url(settings.REDIS_URL)
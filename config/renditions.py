@@ -0,0 +1,249 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Manager
+from django.db.models.signals import post_save
+from rest_framework import serializers
+
+# Изображения, для которых строятся уменьшенные копии: модель -> поле
+RENDITION_FIELDS = {
+    "materials.Course": "preview",
+    "materials.Lesson": "preview",
+    "users.User": "avatar",
+}
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+RENDITIONS_KEY = "renditions:{name}"
+
+
+def rendition_name(name, width, fmt):
+    """
+    Имя копии рядом с оригиналом: previews/cat.png -> previews/cat.w480.webp
+    """
+    root, _ = os.path.splitext(name)
+    return f"{root}.w{width}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+def rendition_names(name):
+    """
+    Имена всех копий изображения {ширина: {формат: имя}}
+    """
+    return {
+        width: {fmt: rendition_name(name, width, fmt) for fmt in settings.RENDITION_FORMATS}
+        for width in settings.RENDITION_WIDTHS
+    }
+
+
+def is_rendered(fieldfile):
+    """
+    Готовы ли копии изображения. Копии сохраняются от меньшей ширины
+    к большей, поэтому достаточно проверить последнюю.
+    """
+    width = settings.RENDITION_WIDTHS[-1]
+    fmt = list(settings.RENDITION_FORMATS)[-1]
+    return fieldfile.storage.exists(rendition_name(fieldfile.name, width, fmt))
+
+
+def render(fieldfile, force=False):
+    """
+    Строит копии изображения всех ширин и форматов в хранилище оригинала.
+    Изображение не увеличивается: копии шире оригинала получают его размер.
+    :return: количество сохраненных файлов
+    """
+    from PIL import Image, ImageOps
+
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, "rb") as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+
+    saved = 0
+    for width, names in rendition_names(fieldfile.name).items():
+        image = original.copy()
+        image.thumbnail((width, width * 10), Image.LANCZOS)
+        for fmt, name in names.items():
+            if storage.exists(name):
+                if not force:
+                    continue
+                storage.delete(name)
+
+            converted = image
+            if fmt == "jpeg" and image.mode != "RGB":
+                converted = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA"):
+                converted = image.convert("RGBA")
+
+            buffer = BytesIO()
+            converted.save(
+                buffer, format=fmt, quality=settings.RENDITION_FORMATS[fmt], optimize=True
+            )
+            storage.save(name, ContentFile(buffer.getvalue()))
+            saved += 1
+    cache.set(
+        rendition_key(fieldfile.name),
+        build_rendition_urls(fieldfile),
+        settings.RENDITION_URLS_TTL,
+    )
+    return saved
+
+
+def build_rendition_urls(fieldfile):
+    """
+    Относительные ссылки на копии изображения с хешем версии
+    или False, если копии еще не готовы
+    """
+    if not is_rendered(fieldfile):
+        return False
+    return {
+        f"w{width}": {fmt: fieldfile.storage.url(name) for fmt, name in names.items()}
+        for width, names in rendition_names(fieldfile.name).items()
+    }
+
+
+def rendition_key(name):
+    return RENDITIONS_KEY.format(name=hashlib.md5(name.encode()).hexdigest())
+
+
+def get_rendition_urls(fieldfiles):
+    """
+    Ссылки на копии нескольких изображений. Готовность копий и хеши версий
+    берутся из кэша одним запросом, хранилище проверяется только для
+    изображений, которых в кэше нет. Отметка "копии не готовы" хранится
+    недолго и записывается через add, поэтому не перезаписывает ссылки,
+    сохраненные render() во время проверки.
+    :return: словарь {имя изображения: ссылки или False}
+    """
+    fieldfiles = {rendition_key(f.name): f for f in fieldfiles if f}
+    urls = cache.get_many(fieldfiles)
+    missing = {
+        key: build_rendition_urls(fieldfile)
+        for key, fieldfile in fieldfiles.items()
+        if key not in urls
+    }
+    ready = {key: value for key, value in missing.items() if value}
+    if ready:
+        cache.set_many(ready, settings.RENDITION_URLS_TTL)
+    for key in missing.keys() - ready.keys():
+        cache.add(key, False, settings.RENDITION_PENDING_TTL)
+    urls.update(missing)
+    return {fieldfiles[key].name: value for key, value in urls.items()}
+
+
+def rendition_urls(fieldfile, request=None, urls=None):
+    """
+    Ссылки на копии изображения {"w480": {"webp": url, "jpeg": url}}
+    или None, если изображения нет или копии еще не готовы
+    :param urls: результат get_rendition_urls, если он уже получен
+    """
+    if not fieldfile:
+        return None
+    if urls is None:
+        urls = get_rendition_urls([fieldfile])
+    urls = urls.get(fieldfile.name)
+    if not urls:
+        return None
+    if request is None:
+        return urls
+    return {
+        width: {fmt: request.build_absolute_uri(url) for fmt, url in formats.items()}
+        for width, formats in urls.items()
+    }
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """
+    Поле сериализатора со ссылками на уменьшенные копии изображения.
+    Ссылки для всех изображений ответа, включая вложенные сериализаторы
+    (например, уроки в списке курсов), получаются одним запросом к кэшу
+    и запоминаются в корневом сериализаторе.
+    """
+
+    def to_representation(self, value):
+        root = self.root
+        urls = root.__dict__.setdefault("_rendition_urls", {})
+        if value and value.name not in urls:
+            files = [value]
+            if root.instance is not None:
+                if isinstance(root, serializers.ListSerializer):
+                    files += image_files(root.child, root.instance)
+                else:
+                    files += image_files(root, [root.instance])
+            urls.update(get_rendition_urls(files))
+        return rendition_urls(value, self.context.get("request"), urls)
+
+
+def has_renditions(serializer):
+    """
+    Есть ли поля RenditionsField в сериализаторе или вложенных в него
+    """
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ListSerializer):
+            field = field.child
+        if isinstance(field, RenditionsField) or (
+            isinstance(field, serializers.BaseSerializer) and has_renditions(field)
+        ):
+            return True
+    return False
+
+
+def image_files(serializer, objects):
+    """
+    Изображения всех полей RenditionsField сериализатора и вложенных
+    в него сериализаторов для объектов objects. Вложенные сериализаторы
+    без таких полей пропускаются, чтобы не загружать их объекты.
+    """
+    files = []
+    for field in serializer.fields.values():
+        if isinstance(field, RenditionsField):
+            files += [field.get_attribute(obj) for obj in objects]
+        elif isinstance(field, serializers.BaseSerializer) and not has_renditions(
+            field.child if isinstance(field, serializers.ListSerializer) else field
+        ):
+            continue
+        elif isinstance(field, serializers.ListSerializer):
+            nested = []
+            for obj in objects:
+                items = field.get_attribute(obj)
+                if isinstance(items, Manager):
+                    items = items.all()
+                nested += list(items or ())
+            files += image_files(field.child, nested)
+        elif isinstance(field, serializers.BaseSerializer):
+            nested = [field.get_attribute(obj) for obj in objects]
+            files += image_files(field, [obj for obj in nested if obj is not None])
+    return files
+
+
+def schedule_renditions(sender, instance, update_fields=None, **kwargs):
+    """
+    Обработчик post_save: после коммита ставит в очередь построение копий
+    нового изображения. Сохранения, не затрагивающие поле изображения,
+    и уже обработанные изображения пропускаются.
+    """
+    from config.tasks import generate_renditions
+
+    field = RENDITION_FIELDS[sender._meta.label]
+    if update_fields is not None and field not in update_fields:
+        return
+    fieldfile = getattr(instance, field)
+    if not fieldfile or is_rendered(fieldfile):
+        return
+
+    transaction.on_commit(
+        lambda: generate_renditions.delay(sender._meta.label, instance.pk)
+    )
+
+
+def connect_signals():
+    for label in RENDITION_FIELDS:
+        post_save.connect(
+            schedule_renditions,
+            sender=apps.get_model(label),
+            dispatch_uid=f"renditions:{label}",
+        )
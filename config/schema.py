@@ -0,0 +1,149 @@
+import hashlib
+import os
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+SCHEMA_KEY = "openapi:{version}:{fmt}"
+CONTENT_TYPES = {
+    "json": "application/json; charset=utf-8",
+    "yaml": "application/yaml; charset=utf-8",
+}
+
+_schemas = {}
+
+
+def get_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Snippets API",
+        default_version="v1",
+        description="Test description",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@snippets.local"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+@lru_cache
+def code_version():
+    """
+    Версия кода для ключа кэша схемы: CODE_VERSION из окружения (например,
+    хеш коммита при сборке образа) или отпечаток исходников приложений
+    проекта по именам, размерам и времени изменения файлов
+    """
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+
+    fingerprint = hashlib.sha256()
+    base_dir = str(settings.BASE_DIR)
+    for app_config in apps.get_app_configs():
+        if not app_config.path.startswith(base_dir):
+            continue
+        for root, dirs, files in os.walk(app_config.path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    stat = os.stat(os.path.join(root, name))
+                    fingerprint.update(
+                        f"{root}/{name}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+                    )
+    return fingerprint.hexdigest()[:16]
+
+
+def render_schema(fmt):
+    """
+    Полная генерация схемы drf_yasg по всем представлениям.
+    Схема строится для анонимного запроса, как и при обращении к
+    эндпоинту без авторизации. Хост и схема запроса из нее убираются,
+    поэтому клиенты обращаются к тому хосту, с которого получили схему.
+    :return: содержимое в формате json или yaml
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    request = Request(APIRequestFactory().get("/"))
+    request.user = AnonymousUser()
+    generator = OpenAPISchemaGenerator(get_info())
+    schema = generator.get_schema(request=request, public=True)
+    schema.pop("host", None)
+    schema.pop("schemes", None)
+    codec = OpenAPICodecJson if fmt == "json" else OpenAPICodecYaml
+    return codec(validators=[]).encode(schema)
+
+
+def build_schema(fmt):
+    """
+    Генерирует схему и сохраняет ее в памяти процесса и в Redis.
+    Ключ зависит от версии кода, поэтому в Redis схема хранится
+    SCHEMA_CACHE_TTL секунд: схемы прошлых версий после деплоя истекают.
+    """
+    content = render_schema(fmt)
+    schema = {
+        "content": content,
+        "etag": quote_etag(hashlib.sha256(content).hexdigest()[:16]),
+    }
+    key = SCHEMA_KEY.format(version=code_version(), fmt=fmt)
+    cache.set(key, schema, settings.SCHEMA_CACHE_TTL)
+    _schemas[key] = schema
+    return schema
+
+
+def get_schema(fmt):
+    """
+    Схема текущей версии кода: из памяти процесса, из Redis
+    или, при первом обращении, сгенерированная заново
+    """
+    key = SCHEMA_KEY.format(version=code_version(), fmt=fmt)
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = cache.get(key)
+        if schema is None:
+            return build_schema(fmt)
+        _schemas[key] = schema
+    return schema
+
+
+def ui_view(renderer):
+    """
+    Swagger UI или ReDoc. drf_yasg загружается при первом открытии
+    документации, а не при загрузке URL-конфигурации.
+    """
+    view = None
+
+    def lazy_view(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from drf_yasg.views import get_schema_view
+            from rest_framework.permissions import AllowAny
+
+            schema_ui = get_schema_view(
+                get_info(), public=True, permission_classes=(AllowAny,)
+            )
+            view = schema_ui.with_ui(renderer, cache_timeout=0)
+        return view(request, *args, **kwargs)
+
+    return lazy_view
+
+
+def schema_view(request, format):
+    """
+    Схема OpenAPI в формате .json или .yaml с поддержкой If-None-Match
+    """
+    fmt = format.lstrip(".")
+    schema = get_schema(fmt)
+    response = get_conditional_response(request, etag=schema["etag"])
+    if response is None:
+        response = HttpResponse(schema["content"], content_type=CONTENT_TYPES[fmt])
+    response["ETag"] = schema["etag"]
+    response["Cache-Control"] = "public, no-cache"
+    return response
@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from config.uploads import UPLOAD_TARGETS
+
+
+class UploadCreateSerializer(serializers.Serializer):
+    """
+    Сериализатор начала загрузки файла по частям
+    """
+
+    target = serializers.ChoiceField(choices=list(UPLOAD_TARGETS))
+    object_id = serializers.IntegerField(required=False)
+    filename = serializers.CharField(max_length=100)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Файл больше {settings.UPLOAD_MAX_SIZE} байт"
+            )
+        return value
+
+    def validate(self, attrs):
+        if attrs["target"] != "avatar" and "object_id" not in attrs:
+            raise serializers.ValidationError({"object_id": "Обязательное поле."})
+        return attrs
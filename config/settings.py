@@ -11,10 +11,12 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv()
 
@@ -42,16 +44,21 @@ INSTALLED_APPS = [
     "drf_yasg",
     "django_celery_beat",
 
+    "config",
     "users",
     "materials",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "config.middleware.RequestInstrumentationMiddleware",
+    "config.middleware.ProfilingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "config.db_router.ReplicaRoutingMiddleware",
+    "users.middleware.LastSeenMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -82,11 +89,26 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # Лимиты config.throttling.RedisScopedRateThrottle по throttle_scope
+    # представления: на пользователя, для анонимных запросов на IP
+    "DEFAULT_THROTTLE_RATES": {
+        "users_list": os.getenv("THROTTLE_USERS_LIST", "60/min"),
+        "payment_create": os.getenv("THROTTLE_PAYMENT_CREATE", "10/min"),
+        "subscription": os.getenv("THROTTLE_SUBSCRIPTION", "30/min"),
+    },
 }
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Соединения с базой переиспользуются процессом DB_CONN_MAX_AGE секунд
+# и проверяются перед использованием. Общий для веб-процессов и воркеров пул
+# держит PgBouncer (docker-compose, DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE).
+# В режиме пула transaction (DB_POOL_MODE=transaction) серверные курсоры
+# отключаются, так как соединение не закреплено за клиентом между транзакциями.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "session")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -95,9 +117,28 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": DB_POOL_MODE == "transaction",
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433. Безопасные HTTP-запросы
+# читают с реплик, после записи пользователь REPLICA_STICKY_SECONDS секунд
+# читает с основной базы (config.db_router)
+DB_REPLICA_HOSTS = [host for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host]
+for number, replica_host in enumerate(DB_REPLICA_HOSTS, 1):
+    host, _, port = replica_host.partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+READ_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -139,6 +180,28 @@ STATICFILES_DIRS = (BASE_DIR / "static",)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+STORAGES = {
+    "default": {"BACKEND": "config.media.HashedMediaStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Отдача медиафайлов через фронт-прокси: "nginx" (X-Accel-Redirect),
+# "sendfile" (X-Sendfile) или пусто - файлы отдает Django
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT") or None
+MEDIA_ACCEL_PREFIX = "/protected-media/"  # internal location nginx, указывающий на MEDIA_ROOT
+
+# Загрузка файлов по частям
+UPLOAD_TEMP_DIR = BASE_DIR / "uploads"  # Частично загруженные файлы, вне MEDIA_ROOT
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024  # Максимальный размер файла в байтах
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Рекомендуемый клиенту размер части
+UPLOAD_EXPIRE = 24 * 60 * 60  # Через сколько секунд незавершенная загрузка удаляется
+
+# Уменьшенные копии изображений: ширины в пикселях и форматы с качеством сжатия
+RENDITION_WIDTHS = (160, 480, 960)
+RENDITION_FORMATS = {"webp": 80, "jpeg": 85}
+RENDITION_URLS_TTL = 24 * 60 * 60  # Сколько секунд кэшируются ссылки на копии изображения
+RENDITION_PENDING_TTL = 60  # Сколько секунд кэшируется отметка, что копии еще не готовы
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -155,11 +218,63 @@ SIMPLE_JWT = {
 # Stripe
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 
+# Load testing
+# В режиме нагрузочного тестирования Stripe и почта заменяются локальными заглушками
+LOADTEST = os.getenv("LOADTEST") == "1"
+STRIPE_STUB = LOADTEST
+
+# OpenAPI: схема генерируется один раз на версию кода и хранится в Redis,
+# Swagger UI и ReDoc загружают ее с закэшированного эндпоинта
+CODE_VERSION = os.getenv("CODE_VERSION", "")
+SCHEMA_CACHE_TTL = 7 * 24 * 60 * 60  # Сколько секунд схема хранится в Redis, схемы прошлых версий истекают сами
+SWAGGER_SETTINGS = {"SPEC_URL": ("schema-json", {"format": ".json"})}
+REDOC_SETTINGS = {"SPEC_URL": ("schema-json", {"format": ".json"})}
+
+# Instrumentation
+# Заголовок Server-Timing с количеством SQL-запросов, временем в базе, кэше и представлении
+SERVER_TIMING_HEADER = DEBUG or LOADTEST
+# Превышение query_budget представления роняет тесты, в остальных случаях пишется в лог
+QUERY_BUDGET_STRICT = "test" in sys.argv[1:2]
+# Метрики запросов дольше порога пишутся в лог как предупреждение, остальные - на уровне DEBUG
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+
+# Profiling
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED") == "1"
+# Доля запросов, профилируемых cProfile
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.01"))
+# Семплы стеков сохраняются для запросов дольше порога
+PROFILING_SLOW_THRESHOLD_MS = float(os.getenv("PROFILING_SLOW_THRESHOLD_MS", "1000"))
+PROFILING_INTERVAL_MS = 5  # Интервал семплирования стеков в миллисекундах
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_FILES = 200
+
+# Metrics
+# Общий каталог для файлов метрик всех процессов (веб и Celery), без него метрики только процесса
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = 1  # Как часто процесс сохраняет свои метрики в файл, в секундах
+METRICS_STALE_AFTER = 120  # Файл, не обновлявшийся столько секунд, принадлежит завершившемуся процессу
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "config": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
+        "users": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
+    },
+}
+
+# Redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
+
 # Cache
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379",
+        "BACKEND": "config.cache.InstrumentedRedisCache",
+        "LOCATION": REDIS_URL,
     }
 }
 
@@ -168,13 +283,44 @@ CELERY_BEAT_SCHEDULE = {
     "check_activity": {
         "task": "users.tasks.check_activity",
         "schedule": timedelta(
-            days=30
-        ),  # Выполнение задачи "проверка активности" каждый месяц
+            hours=1
+        ),  # Выполнение задачи "проверка активности" каждый час
+    },
+    "flush_last_seen": {
+        "task": "users.tasks.flush_last_seen",
+        "schedule": timedelta(
+            minutes=1
+        ),  # Перенос отметок последней активности из Redis в базу каждую минуту
+    },
+    "cleanup_uploads": {
+        "task": "config.tasks.cleanup_uploads",
+        "schedule": timedelta(
+            hours=6
+        ),  # Удаление частичных файлов заброшенных загрузок
+    },
+    "purge_deleted_courses": {
+        "task": "materials.tasks.purge_deleted_courses",
+        "schedule": timedelta(
+            hours=1
+        ),  # Очистка удаленных курсов, задачи которых не выполнились
+    },
+    "purge_deleted_users": {
+        "task": "users.tasks.purge_deleted_users",
+        "schedule": timedelta(
+            hours=1
+        ),  # Удаление аккаунтов, задачи которых не выполнились
     },
 }
 
+# Activity
+USER_INACTIVITY_DAYS = 30  # Через сколько дней без входа пользователь деактивируется
+CHECK_ACTIVITY_BATCH_SIZE = 1000  # Размер пачки при деактивации пользователей
+LAST_SEEN_INTERVAL = 60  # Как часто (в секундах) процесс пишет отметку активности пользователя в Redis
+# Отметки активности в Redis; в тестах выключены, чтобы запросы не зависели от Redis
+LAST_SEEN_ENABLED = os.getenv("LAST_SEEN_ENABLED", "1") == "1" and "test" not in sys.argv[1:2]
+
 # Email
-EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "config.mail.PooledSMTPEmailBackend")
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_USE_TLS = False
@@ -186,10 +332,66 @@ RECIPIENT_LIST = os.getenv('RECIPIENT_LIST', '').split(',')
 SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", "2"))  # Постоянных SMTP-соединений на процесс
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "10"))  # Писем в секунду на процесс, 0 - без ограничения
+EMAIL_BATCH_SIZE = 100  # Сколько писем отправляет одна задача через одно соединение
+COURSE_UPDATE_NOTIFY_WINDOW = int(os.getenv("COURSE_UPDATE_NOTIFY_WINDOW", "600"))  # Окно (в секундах) объединения уведомлений об изменении курса
+
+# Порядок уроков
+LESSON_RANK_GAP = 65536  # Промежуток между позициями соседних уроков курса
+
+# Лента подписок
+FEED_LESSONS = 5  # Последних уроков курса в ленте
+FEED_BATCH_SIZE = 500  # Сколько лент обновляется одним запросом
+FEED_REFRESH_DELAY = 5  # Окно (в секундах) объединения обновлений курса в лентах
+
+# Admin
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000  # С какого оценочного числа строк списки админки не считаются точно
+
+# Удаление
+PURGE_BATCH_SIZE = 1000  # Сколько строк удаляется одним запросом при очистке удаленных объектов
+ACCOUNT_DELETION_PROGRESS_TTL = 7 * 24 * 60 * 60  # Сколько (в секундах) хранится ход удаления аккаунта
+
 # Celery
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Очереди задач, у каждой свои воркеры (docker-compose): default - ленты
+# и копии изображений, mail - рассылки (пул gevent),
+# maintenance - периодическое обслуживание и очистка.
+# Приоритет от 0 (высший) до 9, внутри очереди задачи с меньшим числом
+# выбираются первыми.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = (
+    Queue("default"),
+    Queue("mail"),
+    Queue("maintenance"),
+)
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_ROUTES = {
+    "materials.tasks.notify_course_update": {"queue": "mail", "priority": 3},
+    "materials.tasks.send_information_about_update": {"queue": "mail", "priority": 5},
+    "users.tasks.flush_last_seen": {"queue": "maintenance", "priority": 2},
+    "users.tasks.purge_user": {"queue": "maintenance", "priority": 4},
+    "materials.tasks.purge_course": {"queue": "maintenance", "priority": 4},
+    "users.tasks.check_activity": {"queue": "maintenance", "priority": 6},
+    "users.tasks.purge_deleted_users": {"queue": "maintenance", "priority": 6},
+    "materials.tasks.purge_deleted_courses": {"queue": "maintenance", "priority": 6},
+    "config.tasks.cleanup_uploads": {"queue": "maintenance", "priority": 8},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+# Воркер берет из очереди не больше задач, чем может выполнить сразу;
+# для коротких задач значение повышается флагом --prefetch-multiplier
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
+
+if LOADTEST:
+    EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    CELERY_TASK_ALWAYS_EAGER = True
@@ -0,0 +1,29 @@
+from celery import shared_task
+from django.apps import apps
+
+from config import uploads
+from config.renditions import RENDITION_FIELDS, render
+
+
+@shared_task
+def generate_renditions(label, pk, force=False):
+    """
+    Строит уменьшенные копии изображения объекта
+    :param label: модель в виде "app_label.Model"
+    :return: количество сохраненных файлов
+    """
+    instance = apps.get_model(label).objects.filter(pk=pk).first()
+    if instance is None:
+        return 0
+    fieldfile = getattr(instance, RENDITION_FIELDS[label])
+    if not fieldfile:
+        return 0
+    return render(fieldfile, force=force)
+
+
+@shared_task
+def cleanup_uploads():
+    """
+    Удаляет частичные файлы загрузок старше UPLOAD_EXPIRE
+    """
+    return uploads.cleanup_uploads()
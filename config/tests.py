@@ -0,0 +1,1021 @@
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, router, transaction
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from redis import RedisError
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config import celery_app
+from config import mail as pooled_mail
+from config import schema
+from config.db_router import ReplicaRoutingMiddleware, routing
+from config.instrumentation import QueryBudgetExceeded, collect_stats
+from config.metrics import store
+from config.paginations import EstimatedCountPaginator
+from config.management.commands.loadtest import percentile
+from config.renditions import (
+    get_rendition_urls,
+    is_rendered,
+    rendition_key,
+    rendition_name,
+)
+from config.throttling import RedisScopedRateThrottle
+from materials.models import Course, Lesson, Subscription
+from materials.views import CourseViewSet, LessonListAPIView
+from users.models import Payments, User
+from users.tasks import check_activity
+
+
+class LoadTestToolsTestCase(APITestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+
+class RequestInstrumentationTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="testuser@example.com")
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("materials:lesson_list"))
+
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="[1-9]\d* queries", cache;dur=[\d.]+;desc="\d+ calls", '
+            r"view;dur=[\d.]+, total;dur=[\d.]+$",
+        )
+
+    def test_cache_calls_are_counted(self):
+        with collect_stats() as stats:
+            cache.set("instrumentation-test", 1)
+            cache.get("instrumentation-test")
+            cache.get_many(["instrumentation-test", "instrumentation-missing"])
+
+        self.assertEqual(stats.cache_calls, 3)
+        self.assertEqual(stats.cache_hits, 2)
+        self.assertEqual(stats.cache_misses, 1)
+
+    def test_only_slow_requests_are_logged_above_debug(self):
+        url = reverse("materials:lesson_list")
+        with self.assertNoLogs("config.requests", level="INFO"):
+            self.client.get(url)
+
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0), self.assertLogs(
+            "config.requests", level="WARNING"
+        ) as logs:
+            self.client.get(url)
+        metrics = json.loads(logs.records[0].getMessage())
+        self.assertEqual(metrics["view"], "materials:lesson_list")
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_query_budget_exceeded_fails_in_strict_mode(self):
+        with mock.patch.object(LessonListAPIView, "query_budget", 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("materials:lesson_list"))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_query_budget_exceeded_logs_warning(self):
+        with mock.patch.object(LessonListAPIView, "query_budget", 0):
+            with self.assertLogs("config.requests", level="WARNING"):
+                response = self.client.get(reverse("materials:lesson_list"))
+
+        self.assertEqual(response.status_code, 200)
+
+
+class GenerateDataTestCase(TestCase):
+    def test_generate_data(self):
+        call_command(
+            "generate_data",
+            users=10,
+            moderators=2,
+            courses=3,
+            lessons_per_course=2,
+            subscriptions_per_user=2,
+            payments_per_user=1,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(User.objects.count(), 12)
+        self.assertEqual(User.objects.filter(groups__name="moderator").count(), 2)
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Lesson.objects.count(), 6)
+        self.assertEqual(Subscription.objects.count(), 20)
+        self.assertEqual(Payments.objects.count(), 10)
+
+
+class ProfilingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="testuser@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sampled_requests_are_profiled_and_capped(self):
+        with self.settings(
+            PROFILING_ENABLED=True,
+            PROFILING_SAMPLE_RATE=1,
+            PROFILING_DIR=self.tmp_dir.name,
+            PROFILING_MAX_FILES=2,
+        ):
+            for _ in range(3):
+                response = self.client.get(
+                    reverse("materials:lesson_list"), HTTP_X_REQUEST_ID="req-1"
+                )
+
+        files = sorted(os.listdir(self.tmp_dir.name))
+        self.assertEqual(response["X-Request-ID"], "req-1")
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].endswith("-materials.lesson_list-req-1.prof"))
+
+        out = StringIO()
+        call_command("profile_report", dir=self.tmp_dir.name, stdout=out)
+        self.assertIn("cProfile: профилей 2", out.getvalue())
+
+    def test_slow_requests_keep_stack_samples(self):
+        with self.settings(
+            PROFILING_ENABLED=True,
+            PROFILING_SAMPLE_RATE=0,
+            PROFILING_SLOW_THRESHOLD_MS=0,
+            PROFILING_DIR=self.tmp_dir.name,
+        ):
+            self.client.get(reverse("materials:lesson_list"))
+
+        files = os.listdir(self.tmp_dir.name)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith(".samples.json"))
+
+        out = StringIO()
+        call_command("profile_report", dir=self.tmp_dir.name, stdout=out)
+        self.assertIn("Семплер стеков: профилей 1", out.getvalue())
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="testuser@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        store.reset()
+
+    def tearDown(self):
+        store.reset()
+        self.tmp_dir.cleanup()
+
+    def test_request_and_task_metrics(self):
+        self.client.get(reverse("materials:lesson_list"))
+        check_activity.apply()
+
+        response = self.client.get(reverse("metrics"))
+        body = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",view="materials:lesson_list"} 1',
+            body,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="materials:lesson_list"} 1', body
+        )
+        self.assertIn(
+            'celery_tasks_total{state="SUCCESS",task="users.tasks.check_activity"} 1',
+            body,
+        )
+        self.assertIn(
+            'celery_task_duration_seconds_bucket{task="users.tasks.check_activity",le="+Inf"} 1',
+            body,
+        )
+
+    def test_metrics_are_aggregated_across_processes(self):
+        other_process = {
+            "counters": [
+                [
+                    "http_requests_total",
+                    [["method", "GET"], ["status", 200], ["view", "users:users_list"]],
+                    5,
+                ]
+            ],
+            "histograms": [],
+        }
+        with open(os.path.join(self.tmp_dir.name, "1.json"), "w") as f:
+            json.dump(other_process, f)
+
+        with self.settings(METRICS_DIR=self.tmp_dir.name):
+            self.client.get(reverse("users:users_list"))
+            body = self.client.get(reverse("metrics")).content.decode()
+
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",view="users:users_list"} 6',
+            body,
+        )
+
+    def test_stale_process_files_are_retired(self):
+        other_process = {
+            "counters": [
+                [
+                    "http_requests_total",
+                    [["method", "GET"], ["status", 200], ["view", "users:users_list"]],
+                    5,
+                ]
+            ],
+            "histograms": [],
+        }
+        stale = os.path.join(self.tmp_dir.name, "other-host-1.json")
+        with open(stale, "w") as f:
+            json.dump(other_process, f)
+        os.utime(stale, (0, 0))
+
+        with self.settings(METRICS_DIR=self.tmp_dir.name):
+            self.client.get(reverse("users:users_list"))
+            self.client.get(reverse("metrics"))
+            body = self.client.get(reverse("metrics")).content.decode()
+
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",view="users:users_list"} 6',
+            body,
+        )
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.tmp_dir.name) if name.endswith(".json")),
+            sorted([store.filename, "retired.json"]),
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """
+    Минимальный SMTP-сервер для тестов: принимает все письма
+    и запоминает их вместе с номером соединения
+    """
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            connection_number = server.connections
+            server.sockets.append(self.connection)
+        self.reply("220 stand-in ESMTP")
+
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    with server.lock:
+                        server.messages.append(connection_number)
+                    self.reply("250 OK")
+                continue
+
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply("250 stand-in")
+            elif command == b"DATA":
+                in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == b"QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+    def reply(self, text):
+        self.wfile.write(f"{text}\r\n".encode())
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPStandInHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.sockets = []
+
+    def drop_connections(self):
+        for sock in self.sockets:
+            sock.shutdown(socket.SHUT_RDWR)
+
+
+class PooledMailTestCase(TestCase):
+    def setUp(self):
+        self.server = SMTPStandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.override = override_settings(
+            EMAIL_BACKEND="config.mail.PooledSMTPEmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_RATE_LIMIT=0,
+        )
+        self.override.enable()
+        pooled_mail.pool.clear()
+
+    def tearDown(self):
+        pooled_mail.pool.clear()
+        self.override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send_batch(self, count):
+        messages = [
+            mail.EmailMessage("Тема", "Текст", "from@example.com", [f"user{i}@example.com"])
+            for i in range(count)
+        ]
+        with mail.get_connection() as connection:
+            return connection.send_messages(messages)
+
+    def test_connection_is_reused_between_batches(self):
+        self.assertEqual(self.send_batch(5), 5)
+        self.assertEqual(self.send_batch(5), 5)
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.messages, [1] * 10)
+
+    def test_dropped_connection_is_replaced(self):
+        self.send_batch(1)
+        self.server.drop_connections()
+
+        self.assertEqual(self.send_batch(2), 2)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(self.server.messages, [1, 2, 2])
+
+    def test_rate_limit_delays_sending(self):
+        with self.settings(EMAIL_RATE_LIMIT=20):
+            started = time.monotonic()
+            self.send_batch(25)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(len(self.server.messages), 25)
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_update_notification_task_sends_batch(self):
+        from materials.tasks import send_information_about_update
+
+        sent = send_information_about_update(
+            "Обновление курса", "Курс обновлен", emails=["a@example.com", "b@example.com"]
+        )
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(self.server.connections, 1)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class RenditionsTestCase(APITestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        self.user = User.objects.create(email="testuser@example.com")
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        self.media.cleanup()
+
+    @staticmethod
+    def image(name="preview.png", size=(1200, 600)):
+        buffer = BytesIO()
+        Image.new("RGBA", size, (200, 10, 10, 255)).save(buffer, format="PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_renditions_are_generated_after_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(
+                title="Course", owner=self.user, preview=self.image()
+            )
+
+        self.assertTrue(is_rendered(course.preview))
+        name = rendition_name(course.preview.name, 480, "webp")
+        with course.preview.storage.open(name) as f:
+            self.assertEqual(Image.open(f).size, (480, 240))
+        with course.preview.storage.open(rendition_name(course.preview.name, 160, "jpeg")) as f:
+            self.assertEqual(Image.open(f).format, "JPEG")
+
+        response = self.client.get(reverse("materials:course-detail", args=(course.pk,)))
+        renditions = response.json()["preview_renditions"]
+        self.assertRegex(renditions["w480"]["webp"], r"\.w480\.webp\?v=\w+$")
+        self.assertRegex(renditions["w960"]["jpeg"], r"\.w960\.jpg\?v=\w+$")
+
+    def test_list_reads_rendition_urls_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Course.objects.create(
+                    title=f"Course {i}", owner=self.user, preview=self.image()
+                )
+
+        with mock.patch("config.renditions.is_rendered") as rendered, mock.patch(
+            "config.media.file_hash"
+        ) as file_hash, mock.patch.object(
+            cache, "get_many", wraps=cache.get_many
+        ) as get_many:
+            response = self.client.get(reverse("materials:course-list"))
+
+        results = response.json()["results"]
+        self.assertEqual(len(results), 3)
+        for course in results:
+            self.assertRegex(course["preview_renditions"]["w160"]["webp"], r"\?v=\w+$")
+        rendered.assert_not_called()
+        # Хеш считается только для ссылок на оригиналы, по одной на курс
+        self.assertEqual(file_hash.call_count, 3)
+        self.assertEqual(get_many.call_count, 1)
+
+    def test_nested_lesson_renditions_use_one_cache_lookup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                course = Course.objects.create(
+                    title=f"Course {i}", owner=self.user, preview=self.image()
+                )
+                for j in range(2):
+                    Lesson.objects.create(
+                        course=course, title=f"Lesson {j}", preview=self.image()
+                    )
+
+        with mock.patch("config.renditions.is_rendered") as rendered, mock.patch.object(
+            cache, "get_many", wraps=cache.get_many
+        ) as get_many, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("materials:course-list"))
+
+        lessons = [
+            lesson
+            for course in response.json()["results"]
+            for lesson in course["lessons_list"]
+        ]
+        self.assertEqual(len(lessons), 6)
+        for lesson in lessons:
+            self.assertRegex(lesson["preview_renditions"]["w480"]["jpeg"], r"\?v=\w+$")
+        rendered.assert_not_called()
+        self.assertEqual(get_many.call_count, 1)
+        self.assertLessEqual(len(queries), CourseViewSet.query_budget)
+
+    def test_pending_mark_does_not_hide_ready_renditions(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            course = Course.objects.create(
+                title="Course", owner=self.user, preview=self.image()
+            )
+        key = rendition_key(course.preview.name)
+        cache.delete(key)
+
+        def finish_render_during_check(fieldfile):
+            # render() сохраняет готовые ссылки, пока чтение проверяет хранилище
+            cache.set(key, {"w160": {}}, 60)
+            return False
+
+        with mock.patch(
+            "config.renditions.build_rendition_urls",
+            side_effect=finish_render_during_check,
+        ):
+            self.assertFalse(get_rendition_urls([course.preview])[course.preview.name])
+        self.assertEqual(cache.get(key), {"w160": {}})
+
+    def test_backfill_existing_images(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.user.avatar = self.image("avatar.png", size=(100, 100))
+            self.user.save()
+        self.assertFalse(is_rendered(self.user.avatar))
+
+        out = StringIO()
+        call_command("generate_renditions", "--sync", "--model", "users.User", stdout=out)
+
+        self.assertIn("users.User: изображений 1", out.getvalue())
+        self.assertTrue(is_rendered(self.user.avatar))
+        with self.user.avatar.storage.open(
+            rendition_name(self.user.avatar.name, 960, "webp")
+        ) as f:
+            self.assertEqual(Image.open(f).size, (100, 100))
+
+
+class MediaServingTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        self.content = bytes(range(256)) * 4
+        os.makedirs(os.path.join(self.media.name, "docs"))
+        with open(os.path.join(self.media.name, "docs", "file.bin"), "wb") as f:
+            f.write(self.content)
+        self.url = reverse("media", args=("docs/file.bin",))
+
+    def tearDown(self):
+        self.override.disable()
+        self.media.cleanup()
+
+    def test_full_response_with_hashed_url(self):
+        hashed_url = default_storage.url("docs/file.bin")
+        self.assertRegex(hashed_url, r"^/media/docs/file.bin\?v=[0-9a-f]{16}$")
+
+        response = self.client.get(hashed_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("must-revalidate", self.client.get(self.url)["Cache-Control"])
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-4:])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_request(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_accel_redirect_and_traversal(self):
+        with self.settings(MEDIA_ACCEL_REDIRECT="nginx"):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/docs/file.bin")
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get("/media/../config/settings.py")
+        self.assertEqual(response.status_code, 404)
+
+
+class ChunkedUploadTestCase(APITestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.override = override_settings(
+            MEDIA_ROOT=os.path.join(self.media.name, "media"),
+            UPLOAD_TEMP_DIR=os.path.join(self.media.name, "uploads"),
+        )
+        self.override.enable()
+        self.user = User.objects.create(email="owner@example.com")
+        self.course = Course.objects.create(title="Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), (0, 120, 200)).save(buffer, format="PNG")
+        self.content = buffer.getvalue()
+
+    def tearDown(self):
+        self.override.disable()
+        self.media.cleanup()
+
+    def start(self, **data):
+        data = {"filename": "preview.png", "size": len(self.content), **data}
+        return self.client.post(reverse("upload_create"), data)
+
+    def put_chunk(self, upload_id, offset, chunk):
+        return self.client.put(
+            reverse("upload_detail", args=(upload_id,)),
+            chunk,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resumable_upload_attaches_file(self):
+        upload_id = self.start(target="course", object_id=self.course.pk).json()["id"]
+        half = len(self.content) // 2
+
+        response = self.put_chunk(upload_id, 0, self.content[:half])
+        self.assertEqual(response.json()["offset"], half)
+        response = self.put_chunk(upload_id, 0, self.content[:half])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], half)
+
+        response = self.client.get(reverse("upload_detail", args=(upload_id,)))
+        offset = response.json()["offset"]
+        self.put_chunk(upload_id, offset, self.content[offset:])
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post(reverse("upload_complete", args=(upload_id,)))
+
+        self.assertEqual(response.status_code, 200)
+        self.course.refresh_from_db()
+        with self.course.preview.open("rb") as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, "uploads")), [])
+
+    def test_incomplete_and_foreign_uploads(self):
+        upload_id = self.start(target="avatar").json()["id"]
+        self.put_chunk(upload_id, 0, self.content[:10])
+        response = self.client.post(reverse("upload_complete", args=(upload_id,)))
+        self.assertEqual(response.status_code, 409)
+
+        response = self.put_chunk(upload_id, 10, self.content[10:] + b"extra")
+        self.assertEqual(response.status_code, 413)
+
+        other = User.objects.create(email="other@example.com")
+        self.client.force_authenticate(user=other)
+        response = self.start(target="course", object_id=self.course.pk)
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse("upload_detail", args=(upload_id,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_target_is_checked_again_on_completion(self):
+        complete = []
+        for _ in range(2):
+            upload_id = self.start(target="course", object_id=self.course.pk).json()["id"]
+            self.put_chunk(upload_id, 0, self.content)
+            complete.append(reverse("upload_complete", args=(upload_id,)))
+
+        self.course.owner = User.objects.create(email="new-owner@example.com")
+        self.course.save()
+        self.assertEqual(self.client.post(complete[0]).status_code, 403)
+
+        self.course.deleted_at = timezone.now()
+        self.course.save()
+        self.assertEqual(self.client.post(complete[1]).status_code, 404)
+        self.assertEqual(self.client.post(complete[1]).status_code, 404)
+        self.assertFalse(Course.all_objects.get(pk=self.course.pk).preview)
+
+    def test_extension_follows_image_format(self):
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8)).save(buffer, format="GIF")
+        self.content = buffer.getvalue() + b"<html><script>alert(1)</script></html>"
+        upload_id = self.start(target="avatar", filename="x.html").json()["id"]
+        self.put_chunk(upload_id, 0, self.content)
+
+        response = self.client.post(reverse("upload_complete", args=(upload_id,)))
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar.name.endswith(".gif"))
+        media = self.client.get(f"/media/{self.user.avatar.name}")
+        self.assertEqual(media["Content-Type"], "image/gif")
+
+    def test_not_an_image_is_rejected(self):
+        self.content = b"not an image" * 10
+        upload_id = self.start(target="avatar").json()["id"]
+        self.put_chunk(upload_id, 0, self.content)
+
+        response = self.client.post(reverse("upload_complete", args=(upload_id,)))
+
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+
+class SchemaTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        schema._schemas.clear()
+
+    def test_schema_is_generated_once_and_supports_etag(self):
+        url = reverse("schema-json", args=(".json",))
+        render_schema = schema.render_schema
+        with mock.patch(
+            "config.schema.render_schema", wraps=render_schema
+        ) as render, mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            response = self.client.get(url)
+            schema._schemas.clear()
+            again = self.client.get(url)
+
+        self.assertEqual(render.call_count, 1)
+        timeouts = [
+            call.args[2]
+            for call in cache_set.call_args_list
+            if call.args[0].startswith("openapi:")
+        ]
+        self.assertEqual(timeouts, [settings.SCHEMA_CACHE_TTL])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("/materials/", response.json()["paths"])
+        self.assertEqual(response["ETag"], again["ETag"])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_generate_schema_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".yaml") as f:
+            call_command(
+                "generate_schema", "--output", f.name, "--format", "yaml", stdout=StringIO()
+            )
+            self.assertIn(b"swagger:", f.read())
+
+        with mock.patch("config.schema.render_schema") as render:
+            self.client.get(reverse("schema-json", args=(".yaml",)))
+        render.assert_not_called()
+
+
+class StartupBenchmarkTestCase(TestCase):
+    def test_heavy_modules_are_not_loaded_at_startup(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            call_command(
+                "startup_benchmark", "--runs", "1", "--output", f.name, stdout=StringIO()
+            )
+            result = json.load(f)
+
+        self.assertEqual(result["eagerly_loaded"], [])
+        self.assertEqual(
+            set(result["summary"]), {"setup", "urls", "first_request", "total"}
+        )
+        self.assertEqual(result["runs"][0]["status"], 401)
+
+
+class DatabasePoolTestCase(TestCase):
+    def setUp(self):
+        store.reset()
+
+    def tearDown(self):
+        store.reset()
+
+    def test_opened_connections_are_counted(self):
+        connection_created.send(sender=connection.__class__, connection=connection)
+
+        out = StringIO()
+        call_command("db_pool_stats", stdout=out)
+
+        self.assertIn("CONN_HEALTH_CHECKS", out.getvalue())
+        self.assertIn("открыто соединений {'alias': 'default'}: 1", out.getvalue())
+
+
+@override_settings(READ_REPLICAS=["replica1"])
+class ReplicaRouterTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="writer@example.com")
+        self.factory = RequestFactory()
+        self.used = []
+
+    def view(self, request):
+        self.used.append(router.db_for_read(Course))
+        if request.method == "POST":
+            router.db_for_write(Course)
+            self.used.append(router.db_for_read(Course))
+            request.user = self.user
+        return HttpResponse()
+
+    def request(self, method, user=None):
+        headers = {}
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        request = getattr(self.factory, method)("/", **headers)
+        request.user = AnonymousUser()
+        ReplicaRoutingMiddleware(self.view)(request)
+        return self.used.pop(-1)
+
+    def test_reads_go_to_replica_and_stick_after_write(self):
+        self.assertEqual(self.request("get", self.user), "replica1")
+
+        self.assertEqual(self.request("post", self.user), "default")
+        self.assertEqual(self.used, ["default"])
+
+        self.assertEqual(self.request("get", self.user), "default")
+        other = User.objects.create(email="reader@example.com")
+        self.assertEqual(self.request("get", other), "replica1")
+        self.assertEqual(self.request("get"), "replica1")
+
+        cache.clear()
+        self.assertEqual(self.request("get", self.user), "replica1")
+
+    def test_reads_outside_requests_and_transactions_use_primary(self):
+        self.assertEqual(router.db_for_read(Course), "default")
+        with routing(use_replicas=True):
+            self.assertEqual(router.db_for_read(Course), "replica1")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Course), "default")
+
+    def test_migrations_only_on_primary(self):
+        self.assertFalse(router.allow_migrate("replica1", "materials"))
+        self.assertTrue(router.allow_migrate("default", "materials"))
+
+
+@mock.patch.object(
+    RedisScopedRateThrottle,
+    "THROTTLE_RATES",
+    {"users_list": "2/min", "payment_create": "2/min", "subscription": "2/min"},
+)
+class ThrottlingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="throttled@example.com")
+        self.course = Course.objects.create(title="Throttled")
+        self.windows = {}
+
+    def sliding_window(self, key, limit, window):
+        self.windows.setdefault(key, 0)
+        if self.windows[key] >= limit:
+            return False, 1.5
+        self.windows[key] += 1
+        return True, 0
+
+    def test_anonymous_requests_limited_per_ip(self):
+        url = reverse("users:users_list")
+        with mock.patch(
+            "config.throttling.sliding_window", side_effect=self.sliding_window
+        ):
+            statuses = [self.client.get(url).status_code for _ in range(3)]
+            response = self.client.get(url)
+            other_ip = self.client.get(url, REMOTE_ADDR="10.0.0.2")
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertEqual(other_ip.status_code, 200)
+        self.assertIn("throttle:users_list:ip:127.0.0.1", self.windows)
+
+    def test_subscription_limits_changes_per_user(self):
+        self.client.force_authenticate(self.user)
+        url = f"/subscription/{self.course.pk}/"
+        with mock.patch(
+            "config.throttling.sliding_window", side_effect=self.sliding_window
+        ):
+            statuses = [
+                self.client.post(url, {"course_id": self.course.pk}).status_code
+                for _ in range(3)
+            ]
+            deleted = self.client.delete(url)
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(deleted.status_code, 429)
+        self.assertEqual(
+            self.windows, {f"throttle:subscription:user:{self.user.pk}": 2}
+        )
+
+    def test_redis_errors_do_not_block_requests(self):
+        with mock.patch(
+            "config.throttling.sliding_window", side_effect=RedisError
+        ), self.assertLogs("config.throttling", "WARNING"):
+            response = self.client.get(reverse("users:users_list"))
+        self.assertEqual(response.status_code, 200)
+
+
+class AdminQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(
+            email="admin@example.com", is_staff=True, is_superuser=True
+        )
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            user = User.objects.create(email=f"user{User.objects.count()}@example.com")
+            course = Course.objects.create(title="Course", owner=user)
+            lesson = Lesson.objects.create(title="Lesson", course=course, owner=user)
+            Subscription.objects.create(user=user, course=course)
+            Payments.objects.create(
+                user=user, paid_lesson=lesson, payment_count=100, payment_method="card"
+            )
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for name in (
+            "users_payments",
+            "materials_lesson",
+            "materials_subscription",
+            "users_user",
+            "materials_course",
+        ):
+            url = reverse(f"admin:{name}_changelist")
+            with self.subTest(name):
+                self.add_rows(1)
+                with CaptureQueriesContext(connection) as single:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.add_rows(5)
+                with CaptureQueriesContext(connection) as many:
+                    self.client.get(url)
+                self.assertEqual(len(single), len(many))
+
+    def test_large_tables_use_estimated_count(self):
+        self.add_rows(2)
+        url = reverse("admin:users_payments_changelist")
+
+        with mock.patch("config.paginations.estimate_count", return_value=5_000_000):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+
+        self.assertContains(response, "5000000")
+        self.assertFalse(
+            [query for query in queries if "COUNT(" in query["sql"].upper()]
+        )
+        paginator = EstimatedCountPaginator(Payments.objects.order_by("pk"), 10)
+        self.assertEqual(paginator.count, 2)
+
+
+class TaskRoutingTestCase(TestCase):
+    def route(self, name):
+        options = celery_app.amqp.router.route({}, name)
+        return options["queue"].name, options.get("priority")
+
+    def test_tasks_are_routed_to_queues(self):
+        self.assertEqual(
+            self.route("materials.tasks.send_information_about_update"), ("mail", 5)
+        )
+        self.assertEqual(self.route("materials.tasks.notify_course_update"), ("mail", 3))
+        self.assertEqual(self.route("users.tasks.flush_last_seen"), ("maintenance", 2))
+        self.assertEqual(self.route("users.tasks.check_activity"), ("maintenance", 6))
+        self.assertEqual(self.route("materials.tasks.rebuild_feed"), ("default", None))
+
+    def test_beat_tasks_do_not_use_default_queue(self):
+        for entry in celery_app.conf.beat_schedule.values():
+            with self.subTest(entry["task"]):
+                self.assertEqual(self.route(entry["task"])[0], "maintenance")
+
+
+class DirtyFieldsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="dirty@example.com")
+        self.course = Course.objects.create(title="Course", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def writes(self, queries):
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE"))
+        ]
+
+    def test_saves_only_changed_fields(self):
+        course = Course.objects.get(pk=self.course.pk)
+        with CaptureQueriesContext(connection) as queries:
+            course.save()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(course.changed_fields, set())
+
+        course.title = "Renamed"
+        with CaptureQueriesContext(connection) as queries:
+            course.save()
+        self.assertEqual(course.changed_fields, {"title"})
+        self.assertEqual(course.previous_values, {"title": "Course"})
+        (update,) = self.writes(queries)
+        self.assertNotIn("description", update)
+
+        course.save()
+        self.assertEqual(course.changed_fields, set())
+
+    def test_course_create_inserts_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("materials:course-list"), {"title": "New"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.writes(queries)), 1)
+        self.assertEqual(Course.objects.get(title="New").owner, self.user)
+
+    @override_settings(STRIPE_STUB=True)
+    def test_unchanged_payment_status_is_not_written(self):
+        payment = Payments.objects.create(
+            user=self.user,
+            paid_course=self.course,
+            payment_count=100,
+            payment_method="card",
+            status="paid",
+        )
+        url = reverse("users:payment_detail", args=(payment.pk,))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(self.writes(queries), [])
+
+        Payments.objects.filter(pk=payment.pk).update(status="unpaid")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(self.writes(queries)), 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "paid")
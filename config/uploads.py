@@ -0,0 +1,188 @@
+import os
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files import File
+
+# Поля, в которые можно загрузить файл по частям: цель -> (модель, поле)
+UPLOAD_TARGETS = {
+    "course": ("materials.Course", "preview"),
+    "lesson": ("materials.Lesson", "preview"),
+    "avatar": ("users.User", "avatar"),
+}
+
+# Допустимые форматы изображений и расширения, с которыми они сохраняются
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+UPLOAD_KEY = "uploads:{upload_id}"
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """
+    Ошибка загрузки с HTTP-статусом ответа
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class PartFile(File):
+    """
+    Собранный файл загрузки. Хранилище на файловой системе перемещает его
+    по temporary_file_path() вместо копирования.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload_id):
+    return os.path.join(settings.UPLOAD_TEMP_DIR, f"{upload_id}.part")
+
+
+def get_offset(upload_id):
+    """
+    Сколько байт уже получено: размер частичного файла на диске,
+    поэтому после обрыва загрузка продолжается с последнего записанного байта
+    """
+    try:
+        return os.path.getsize(part_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def create_upload(user, target, filename, size, object_id=None):
+    """
+    Начинает загрузку файла в поле объекта
+    :return: состояние загрузки
+    """
+    upload = {
+        "id": uuid.uuid4().hex,
+        "user_id": user.pk,
+        "target": target,
+        "object_id": object_id,
+        "filename": os.path.basename(filename),
+        "size": size,
+    }
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    open(part_path(upload["id"]), "wb").close()
+    cache.set(
+        UPLOAD_KEY.format(upload_id=upload["id"]), upload, settings.UPLOAD_EXPIRE
+    )
+    return upload
+
+
+def get_upload(upload_id, user):
+    """
+    Состояние загрузки пользователя или None
+    """
+    upload = cache.get(UPLOAD_KEY.format(upload_id=upload_id))
+    if upload is None or upload["user_id"] != user.pk:
+        return None
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Дописывает часть файла из потока запроса блоками по READ_SIZE,
+    не держа часть целиком в памяти
+    :return: новое смещение
+    """
+    lock_key = UPLOAD_KEY.format(upload_id=upload["id"]) + ":lock"
+    if not cache.add(lock_key, True, 60):
+        raise UploadError("Часть этой загрузки уже принимается", status=409)
+    try:
+        current = get_offset(upload["id"])
+        if offset != current:
+            raise UploadError("Неверное смещение части", status=409)
+        if current + length > upload["size"]:
+            raise UploadError("Часть выходит за объявленный размер файла", status=413)
+
+        with open(part_path(upload["id"]), "ab") as f:
+            remaining = length
+            while remaining:
+                chunk = stream.read(min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+    finally:
+        cache.delete(lock_key)
+    return get_offset(upload["id"])
+
+
+def get_target(upload):
+    """
+    Объект, в поле которого загружается файл. Если объект удален
+    (курс - в том числе мягко) за время загрузки, загрузка отменяется.
+    """
+    label, _ = UPLOAD_TARGETS[upload["target"]]
+    try:
+        return apps.get_model(label).objects.get(pk=upload["object_id"])
+    except ObjectDoesNotExist:
+        discard_upload(upload)
+        raise UploadError("Объект загрузки не найден", status=404)
+
+
+def complete_upload(upload, instance):
+    """
+    Проверяет собранный файл и сохраняет его в поле изображения объекта.
+    Расширение сохраненного файла берется из формата изображения, а не из
+    имени от клиента, чтобы файл не отдавался с другим типом содержимого.
+    :return: объект, к которому прикреплен файл
+    """
+    from PIL import Image
+
+    path = part_path(upload["id"])
+    if get_offset(upload["id"]) != upload["size"]:
+        raise UploadError("Файл загружен не полностью", status=409)
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+            extension = IMAGE_EXTENSIONS.get(image.format)
+    except Exception:
+        extension = None
+    if extension is None:
+        discard_upload(upload)
+        raise UploadError("Загруженный файл не является изображением")
+
+    _, field = UPLOAD_TARGETS[upload["target"]]
+    root, _ = os.path.splitext(upload["filename"])
+    filename = f"{root or 'image'}.{extension}"
+    with open(path, "rb") as f:
+        getattr(instance, field).save(filename, PartFile(f), save=False)
+    instance.save(update_fields=[field])
+
+    discard_upload(upload)
+    return instance
+
+
+def discard_upload(upload):
+    cache.delete(UPLOAD_KEY.format(upload_id=upload["id"]))
+    try:
+        os.remove(part_path(upload["id"]))
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_uploads():
+    """
+    Удаляет частичные файлы заброшенных загрузок
+    :return: количество удаленных файлов
+    """
+    if not os.path.isdir(settings.UPLOAD_TEMP_DIR):
+        return 0
+    deadline = time.time() - settings.UPLOAD_EXPIRE
+    removed = 0
+    for entry in os.scandir(settings.UPLOAD_TEMP_DIR):
+        if entry.name.endswith(".part") and entry.stat().st_mtime < deadline:
+            os.remove(entry.path)
+            removed += 1
+    return removed
@@ -1,38 +1,34 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Snippets API",
-        default_version="v1",
-        description="Test description",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@snippets.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
+from config.media import serve_media
+from config.schema import schema_view, ui_view
+from config.views import (
+    UploadAPIView,
+    UploadCompleteAPIView,
+    UploadCreateAPIView,
+    metrics_view,
 )
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("materials.urls", namespace="materials")),
     path("users/", include("users.urls", namespace="users")),
+    re_path(r"^swagger(?P<format>\.json|\.yaml)/$", schema_view, name="schema-json"),
+    path("swagger/", ui_view("swagger"), name="schema-swagger-ui"),
+    path("redoc/", ui_view("redoc"), name="schema-redoc"),
+    path("metrics", metrics_view, name="metrics"),
+    path("uploads/", UploadCreateAPIView.as_view(), name="upload_create"),
+    path("uploads/<str:upload_id>/", UploadAPIView.as_view(), name="upload_detail"),
     path(
-        "swagger<format>/", schema_view.without_ui(cache_timeout=0), name="schema-json"
+        "uploads/<str:upload_id>/complete/",
+        UploadCompleteAPIView.as_view(),
+        name="upload_complete",
     ),
-    path(
-        "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
+    re_path(
+        rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media, name="media"
     ),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
 ]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS)
@@ -0,0 +1,144 @@
+from django.apps import apps
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from config.metrics import generate_latest
+from config.serializers import UploadCreateSerializer
+from config.uploads import (
+    UPLOAD_TARGETS,
+    UploadError,
+    complete_upload,
+    create_upload,
+    get_offset,
+    get_target,
+    get_upload,
+    write_chunk,
+)
+from users.permissions import IsModer, IsOwner
+
+
+def metrics_view(request):
+    """
+    Метрики приложения в формате Prometheus.
+    Если задан METRICS_TOKEN, требуется заголовок Authorization: Bearer <токен>
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+class UploadMixin:
+    def get_upload(self, upload_id):
+        """
+        Загрузка текущего пользователя или 404
+        """
+        upload = get_upload(upload_id, self.request.user)
+        if upload is None:
+            raise Http404
+        return upload
+
+    def check_target_permission(self, obj):
+        """
+        Превью загружает владелец объекта или модератор
+        """
+        if not (
+            IsModer().has_permission(self.request, self)
+            or IsOwner().has_object_permission(self.request, self, obj)
+        ):
+            raise PermissionDenied(IsOwner.message)
+
+
+class UploadCreateAPIView(UploadMixin, APIView):
+    """
+    Начало загрузки превью курса, урока или аватара по частям.
+    Превью загружает владелец или модератор, аватар - только свой.
+    """
+
+    def post(self, request):
+        serializer = UploadCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if data["target"] == "avatar":
+            object_id = request.user.pk
+        else:
+            label, _ = UPLOAD_TARGETS[data["target"]]
+            obj = get_object_or_404(apps.get_model(label), pk=data["object_id"])
+            self.check_target_permission(obj)
+            object_id = obj.pk
+
+        upload = create_upload(
+            request.user, data["target"], data["filename"], data["size"], object_id
+        )
+        return Response(
+            {
+                "id": upload["id"],
+                "offset": 0,
+                "size": upload["size"],
+                "chunk_size": settings.UPLOAD_CHUNK_SIZE,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class UploadAPIView(UploadMixin, APIView):
+    """
+    Состояние загрузки (GET) и прием очередной части (PUT).
+    Часть передается телом запроса, смещение - заголовком Upload-Offset.
+    При несовпадении смещения возвращается 409 с текущим смещением,
+    с которого клиент продолжает загрузку.
+    """
+
+    def get(self, request, upload_id):
+        upload = self.get_upload(upload_id)
+        return Response(
+            {"id": upload["id"], "offset": get_offset(upload["id"]), "size": upload["size"]}
+        )
+
+    def put(self, request, upload_id):
+        upload = self.get_upload(upload_id)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers["Content-Length"])
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Нужны заголовки Upload-Offset и Content-Length"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            offset = write_chunk(upload, offset, request.stream, length)
+        except UploadError as e:
+            return Response(
+                {"detail": str(e), "offset": get_offset(upload["id"])}, status=e.status
+            )
+        return Response({"id": upload["id"], "offset": offset, "size": upload["size"]})
+
+
+class UploadCompleteAPIView(UploadMixin, APIView):
+    """
+    Завершение загрузки: файл проверяется и прикрепляется к полю объекта.
+    Права на объект проверяются повторно, они могли измениться с начала загрузки.
+    """
+
+    def post(self, request, upload_id):
+        upload = self.get_upload(upload_id)
+        try:
+            instance = get_target(upload)
+            if upload["target"] != "avatar":
+                self.check_target_permission(instance)
+            instance = complete_upload(upload, instance)
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=e.status)
+
+        _, field = UPLOAD_TARGETS[upload["target"]]
+        url = getattr(instance, field).url
+        return Response({"id": instance.pk, field: request.build_absolute_uri(url)})
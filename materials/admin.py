@@ -1,18 +1,30 @@
 from django.contrib import admin
 
+from config.paginations import EstimatedCountPaginator
 from materials.models import Course, Lesson, Subscription
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ("title", "preview", "description")
+    search_fields = ("title",)
+    autocomplete_fields = ("owner",)
 
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ("course", "title", "description", "preview", "video_link")
+    list_select_related = ("course",)
+    search_fields = ("title",)
+    autocomplete_fields = ("course", "owner")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Subscription)
-class LessonAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "course", "created_at")
+    list_select_related = ("user", "course")
+    autocomplete_fields = ("user", "course")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
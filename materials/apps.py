@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MaterialsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "materials"
+
+    def ready(self):
+        from materials.signals import connect_signals
+
+        connect_signals()
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+
+def batched(iterable, size):
+    """
+    Разбивает поток на пачки не больше size элементов
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def open_source(path):
+    """
+    Открывает файл для чтения, "-" означает стандартный ввод
+    """
+    if path == "-":
+        yield sys.stdin
+    else:
+        with open(path, encoding="utf-8", newline="") as stream:
+            yield stream
+
+
+def detect_format(path, fmt=None):
+    """
+    Определяет формат входных данных: явно заданный или по расширению файла
+    """
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def iter_rows(stream, fmt):
+    """
+    Построчно читает CSV (с заголовком) или JSONL, не загружая файл в память.
+    :return: генератор пар (номер строки, словарь значений)
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                row = {"_raw": line.rstrip("\n"), "_error": str(error)}
+            else:
+                if not isinstance(row, dict):
+                    row = {"_raw": line.rstrip("\n"), "_error": "ожидается объект"}
+            yield line_num, row
+
+
+class RejectWriter:
+    """
+    Запись отклоненных строк в JSONL-файл вместе с причинами отказа
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.stream = None
+        self.count = 0
+
+    def __enter__(self):
+        if self.path:
+            self.stream = open(self.path, "w", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stream is not None:
+            self.stream.close()
+
+    def write(self, line_num, row, errors):
+        self.count += 1
+        if self.stream is not None:
+            record = {"line": line_num, "row": row, "errors": errors}
+            self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def copy_rows(connection, table, columns, rows):
+    """
+    Быстрая вставка пачки строк через PostgreSQL COPY FROM STDIN
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+    buffer.seek(0)
+
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        connection.ops.quote_name(table),
+        ", ".join(connection.ops.quote_name(column) for column in columns),
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
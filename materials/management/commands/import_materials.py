@@ -0,0 +1,200 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from rest_framework import serializers
+
+from materials.importers import (
+    RejectWriter,
+    batched,
+    copy_rows,
+    detect_format,
+    iter_rows,
+    open_source,
+)
+from materials.models import Course, Lesson
+from materials.validators import LinkValidator
+
+MODELS = {
+    "course": (Course, ("title", "description", "owner")),
+    "lesson": (Lesson, ("course", "title", "description", "video_link", "owner")),
+}
+
+
+class Command(BaseCommand):
+    """
+    Массовый импорт курсов или уроков из CSV/JSONL (файл или stdin).
+
+    Пример: python manage.py import_materials lessons.csv --model lesson --rejects rejects.jsonl
+    """
+
+    help = "Импорт курсов или уроков из CSV/JSONL пачками через bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Путь к файлу, "-" для чтения из stdin')
+        parser.add_argument("--model", choices=MODELS, required=True)
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--rejects", help="Файл для отклоненных строк (JSONL)")
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="Вставка через PostgreSQL COPY вместо bulk_create",
+        )
+
+    def handle(self, *args, **options):
+        self.model, self.fields = MODELS[options["model"]]
+        use_copy = options["copy"]
+        if use_copy and connection.vendor != "postgresql":
+            self.stderr.write("COPY доступен только для PostgreSQL, используется bulk_create")
+            use_copy = False
+        if options["batch_size"] < 1:
+            raise CommandError("Размер пачки должен быть положительным")
+
+        fmt = detect_format(options["path"], options["format"])
+        started = time.monotonic()
+        imported = 0
+
+        with open_source(options["path"]) as stream, RejectWriter(
+            options["rejects"]
+        ) as rejects:
+            rows = iter_rows(stream, fmt)
+            for batch in batched(rows, options["batch_size"]):
+                instances = self.validate_batch(batch, rejects)
+                if instances:
+                    with transaction.atomic():
+                        if self.model is Lesson:
+                            self.assign_ranks(instances)
+                        if use_copy:
+                            self.copy(instances)
+                        else:
+                            self.model.objects.bulk_create(instances)
+                imported += len(instances)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Импортировано: {imported}, отклонено: {rejects.count}, "
+                f"{imported / elapsed if elapsed else imported:.0f} строк/с"
+            )
+        )
+
+    def validate_batch(self, batch, rejects):
+        """
+        Проверка пачки строк: поля модели, ссылка на видео и существование
+        связанных объектов (один запрос на пачку, а не на строку)
+        """
+        candidates = []
+        for line_num, row in batch:
+            instance, errors = self.build(row)
+            if errors:
+                rejects.write(line_num, row, errors)
+            else:
+                candidates.append((line_num, row, instance))
+
+        course_ids = {i.course_id for _, _, i in candidates if hasattr(i, "course_id")}
+        owner_ids = {i.owner_id for _, _, i in candidates if i.owner_id is not None}
+        existing_courses = set(
+            Course.objects.filter(pk__in=course_ids).values_list("pk", flat=True)
+        )
+        existing_owners = set(
+            get_user_model()
+            .objects.filter(pk__in=owner_ids)
+            .values_list("pk", flat=True)
+        )
+
+        instances = []
+        for line_num, row, instance in candidates:
+            errors = []
+            if self.model is Lesson and instance.course_id not in existing_courses:
+                errors.append(f"course: курс с id {instance.course_id} не найден")
+            if instance.owner_id is not None and instance.owner_id not in existing_owners:
+                errors.append(f"owner: пользователь с id {instance.owner_id} не найден")
+            if errors:
+                rejects.write(line_num, row, errors)
+            else:
+                instances.append(instance)
+        return instances
+
+    def build(self, row):
+        """
+        Создание несохраненного объекта модели из строки и проверка его полей
+        :return: объект и список ошибок
+        """
+        if "_error" in row:
+            return None, [f"Некорректный JSON: {row['_error']}"]
+
+        values = {}
+        errors = []
+        for name in self.fields:
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in ("", None):
+                value = None
+
+            field = self.model._meta.get_field(name)
+            if field.is_relation:
+                try:
+                    values[field.attname] = int(value) if value is not None else None
+                except (TypeError, ValueError):
+                    errors.append(f"{name}: ожидается целое число, получено {value!r}")
+            else:
+                values[name] = value
+
+        instance = self.model(**values)
+        try:
+            instance.clean_fields(exclude=["preview", "course", "owner"])
+        except ValidationError as error:
+            for name, messages in error.message_dict.items():
+                errors.extend(f"{name}: {message}" for message in messages)
+
+        if self.model is Lesson:
+            if instance.course_id is None:
+                errors.append("course: обязательное поле")
+            if instance.video_link:
+                try:
+                    LinkValidator(field="video_link")(values)
+                except serializers.ValidationError as error:
+                    errors.extend(str(message) for message in error.detail)
+
+        return instance, errors
+
+    def assign_ranks(self, instances):
+        """
+        bulk_create и COPY не вызывают Lesson.save, поэтому позиции
+        уроков расставляются здесь: после последнего урока курса
+        с шагом LESSON_RANK_GAP в порядке строк файла
+        """
+        course_ids = {instance.course_id for instance in instances}
+        # Параллельные импорты и перемещения в этих курсах ждут своей очереди
+        list(
+            Course.all_objects.select_for_update()
+            .filter(pk__in=course_ids)
+            .values_list("pk", flat=True)
+        )
+        last_ranks = dict(
+            Lesson.objects.filter(course_id__in=course_ids)
+            .order_by()
+            .values("course_id")
+            .annotate(rank=Max("rank"))
+            .values_list("course_id", "rank")
+        )
+        for instance in instances:
+            rank = last_ranks.get(instance.course_id, 0) + settings.LESSON_RANK_GAP
+            instance.rank = last_ranks[instance.course_id] = rank
+
+    def copy(self, instances):
+        fields = self.fields + ("rank",) if self.model is Lesson else self.fields
+        columns = [self.model._meta.get_field(name).column for name in fields]
+        attnames = [self.model._meta.get_field(name).attname for name in fields]
+        copy_rows(
+            connection,
+            self.model._meta.db_table,
+            columns,
+            ([getattr(i, attname) for attname in attnames] for i in instances),
+        )
@@ -0,0 +1,35 @@
+from django.core.management import BaseCommand
+
+from materials.models import Subscription
+from materials.services import build_feed
+from materials.tasks import rebuild_feed
+
+
+class Command(BaseCommand):
+    """
+    Собирает ленты подписок всех пользователей с подписками, например
+    после первого развертывания лент. По умолчанию задачи ставятся
+    в очередь Celery, с --sync ленты собираются в текущем процессе.
+    """
+
+    help = "Пересборка лент подписок пользователей"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync", action="store_true", help="Без очереди Celery")
+
+    def handle(self, *args, **options):
+        user_ids = (
+            Subscription.objects.values_list("user_id", flat=True)
+            .distinct()
+            .order_by("user_id")
+        )
+
+        rebuilt = 0
+        for user_id in user_ids.iterator():
+            if options["sync"]:
+                build_feed(user_id)
+            else:
+                rebuild_feed.delay(user_id)
+            rebuilt += 1
+
+        self.stdout.write(f"Лент: {rebuilt}")
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0004_feed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="deleted_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Курс скрыт и ожидает очистки задачей materials.tasks.purge_course",
+                null=True,
+                verbose_name="Дата удаления",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="materials_course_deleted_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+RANK_GAP = 65536
+
+
+def fill_ranks(apps, schema_editor):
+    """
+    Существующие уроки получают позиции в порядке создания
+    """
+    Lesson = apps.get_model("materials", "Lesson")
+    batch = []
+    course_id, position = None, 0
+    for lesson in Lesson.objects.order_by("course_id", "pk").only("pk", "course_id"):
+        if lesson.course_id != course_id:
+            course_id, position = lesson.course_id, 0
+        position += 1
+        lesson.rank = position * RANK_GAP
+        batch.append(lesson)
+        if len(batch) >= 1000:
+            Lesson.objects.bulk_update(batch, ["rank"])
+            batch = []
+    Lesson.objects.bulk_update(batch, ["rank"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0005_course_deleted_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="lesson",
+            options={
+                "ordering": ("course", "rank", "pk"),
+                "verbose_name": "Урок",
+                "verbose_name_plural": "Уроки",
+            },
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="rank",
+            field=models.BigIntegerField(
+                db_default=0,
+                default=0,
+                help_text="Уроки курса идут по возрастанию; между соседями остается промежуток, поэтому перемещение урока меняет одну строку",
+                verbose_name="Позиция в курсе",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(
+                fields=["course", "rank"], name="materials_lesson_rank_idx"
+            ),
+        ),
+        migrations.RunPython(fill_ranks, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,21 @@
+from django.conf import settings
 from django.db import models
 
+from config.models import DirtyFieldsMixin
+
 NULLABLE = {"blank": True, "null": True}
 
 
-class Course(models.Model):
+class CourseManager(models.Manager):
+    """
+    Курсы без помеченных на удаление
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Course(DirtyFieldsMixin, models.Model):
     title = models.CharField(max_length=100, verbose_name="Название курса")
     preview = models.ImageField(
         upload_to="materials_media/courses/previews",
@@ -22,16 +34,31 @@ class Course(models.Model):
         on_delete=models.SET_NULL,
         verbose_name="Владелец курса",
     )
+    deleted_at = models.DateTimeField(
+        verbose_name="Дата удаления",
+        **NULLABLE,
+        help_text="Курс скрыт и ожидает очистки задачей materials.tasks.purge_course",
+    )
+
+    objects = CourseManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                name="materials_course_deleted_idx",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
-class Lesson(models.Model):
+class Lesson(DirtyFieldsMixin, models.Model):
     course = models.ForeignKey(
         Course, on_delete=models.CASCADE, verbose_name="Курс", related_name="lessons"
     )
@@ -59,14 +86,43 @@ class Lesson(models.Model):
         **NULLABLE,
         verbose_name="Владелец урока",
     )
+    rank = models.BigIntegerField(
+        verbose_name="Позиция в курсе",
+        default=0,
+        db_default=0,
+        help_text="Уроки курса идут по возрастанию; между соседями остается "
+        "промежуток, поэтому перемещение урока меняет одну строку",
+    )
 
     class Meta:
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        ordering = ("course", "rank", "pk")
+        indexes = [
+            models.Index(fields=["course", "rank"], name="materials_lesson_rank_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Новый урок без позиции и урок, перенесенный в другой курс,
+        ставятся в конец курса
+        """
+        moved = not self._state.adding and "course" in self.get_dirty_fields()
+        if (self._state.adding and not self.rank) or moved:
+            last = (
+                Lesson.objects.filter(course_id=self.course_id)
+                .exclude(pk=self.pk)
+                .aggregate(rank=models.Max("rank"))["rank"]
+            )
+            self.rank = (last or 0) + settings.LESSON_RANK_GAP
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "rank"}
+        super().save(*args, **kwargs)
+
 
 class Subscription(models.Model):
     user = models.ForeignKey(
@@ -89,3 +145,28 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.course}"
+
+
+class Feed(models.Model):
+    """
+    Готовая лента пользователя: подписанные курсы с последними уроками.
+    Пересобирается задачами при изменении подписок, курсов и уроков,
+    чтение ленты - один запрос по первичному ключу.
+    """
+
+    user = models.OneToOneField(
+        "users.User",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Пользователь",
+        related_name="feed",
+    )
+    items = models.JSONField(default=list, verbose_name="Курсы ленты")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Лента"
+        verbose_name_plural = "Ленты"
+
+    def __str__(self):
+        return f"Лента {self.user}"
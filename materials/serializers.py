@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from materials.models import Course, Lesson, Subscription
+
+from config.renditions import RenditionsField
+from materials.models import Course, Feed, Lesson, Subscription
 from materials.validators import LinkValidator
 
 
@@ -7,6 +9,8 @@ class LessonSerializer(serializers.ModelSerializer):
     """
     Сериализатор для урока
     """
+    preview_renditions = RenditionsField(source="preview")
+
     class Meta:
         model = Lesson
         fields = (
@@ -14,12 +18,35 @@ class LessonSerializer(serializers.ModelSerializer):
             "course",
             "title",
             "description",
+            "preview",
+            "preview_renditions",
             "owner",
             "video_link",
+            "rank",
         )
+        read_only_fields = ("rank",)
         validators = [LinkValidator(field="video_link")]
 
 
+class LessonMoveSerializer(serializers.Serializer):
+    """
+    Сериализатор для перемещения урока: после какого урока курса
+    его поставить (null - в начало курса)
+    """
+
+    after = serializers.PrimaryKeyRelatedField(
+        queryset=Lesson.objects.all(), allow_null=True, default=None
+    )
+
+    def validate_after(self, after):
+        lesson = self.context["lesson"]
+        if after is not None and (
+            after.course_id != lesson.course_id or after.pk == lesson.pk
+        ):
+            raise serializers.ValidationError("Укажите другой урок того же курса")
+        return after
+
+
 class CourseSerializer(serializers.ModelSerializer):
     """
     Сериализатор для курса
@@ -27,14 +54,19 @@ class CourseSerializer(serializers.ModelSerializer):
     lessons_count = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
     lessons_list = LessonSerializer(source="lessons", many=True, read_only=True)
+    preview_renditions = RenditionsField(source="preview")
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         return Subscription.objects.filter(
             user=self.context["request"].user, course=obj
         ).exists()
 
     @staticmethod
     def get_lessons_count(obj: Course) -> int:
+        if hasattr(obj, "lessons_count"):
+            return obj.lessons_count
         return Lesson.objects.filter(course=obj).count()
 
     class Meta:
@@ -43,8 +75,20 @@ class CourseSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "description",
+            "preview",
+            "preview_renditions",
             "lessons_count",
             "lessons_list",
             "owner",
             "is_subscribed",
         )
+
+
+class FeedSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для ленты подписок
+    """
+
+    class Meta:
+        model = Feed
+        fields = ("items", "updated_at")
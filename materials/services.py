@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from materials.models import Course, Feed, Lesson, Subscription
+
+COURSE_UPDATE_KEY = "materials:course_update:{course_id}"
+FEED_REFRESH_KEY = "materials:feed_refresh:{course_id}"
+NOTIFY_FIELDS = {
+    "title": "название",
+    "description": "описание",
+    "lessons": "уроки",
+}
+
+
+def add_course_update(course_id, fields):
+    """
+    Копит измененные видимые пользователю поля курса до отправки уведомления.
+    Каждое поле хранится отдельным ключом кэша, поэтому параллельные
+    изменения не перезаписывают друг друга.
+    :return: True, если это первое изменение в окне и нужно запланировать отправку
+    """
+    key = COURSE_UPDATE_KEY.format(course_id=course_id)
+    timeout = settings.COURSE_UPDATE_NOTIFY_WINDOW * 2
+    cache.set_many({f"{key}:{field}": True for field in fields}, timeout)
+    return cache.add(key, True, timeout)
+
+
+def cancel_course_update(course_id):
+    """
+    Закрывает окно без отправки, если уведомление не удалось запланировать.
+    Накопленные поля остаются и попадут в следующее уведомление.
+    """
+    cache.delete(COURSE_UPDATE_KEY.format(course_id=course_id))
+
+
+def pop_course_update(course_id):
+    """
+    Забирает накопленные изменения курса и открывает новое окно
+    :return: список измененных полей в порядке NOTIFY_FIELDS
+    """
+    key = COURSE_UPDATE_KEY.format(course_id=course_id)
+    cache.delete(key)
+    field_keys = [f"{key}:{field}" for field in NOTIFY_FIELDS]
+    changed = cache.get_many(field_keys)
+    cache.delete_many(changed)
+    return [field for field in NOTIFY_FIELDS if f"{key}:{field}" in changed]
+
+
+def get_feed_entries(course_ids):
+    """
+    Записи ленты для курсов с FEED_LESSONS последними уроками каждого.
+    Уроки всех курсов выбираются одним запросом с ограничением на курс.
+    :return: словарь {id курса: запись ленты}
+    """
+    recent_lessons = Lesson.objects.order_by("-pk")[: settings.FEED_LESSONS]
+    courses = Course.objects.filter(pk__in=course_ids).prefetch_related(
+        Prefetch("lessons", queryset=recent_lessons, to_attr="recent_lessons")
+    )
+    return {
+        course.pk: {
+            "id": course.pk,
+            "title": course.title,
+            "description": course.description,
+            "preview": course.preview.url if course.preview else None,
+            "lessons": [
+                {
+                    "id": lesson.pk,
+                    "title": lesson.title,
+                    "video_link": lesson.video_link,
+                }
+                for lesson in course.recent_lessons
+            ],
+        }
+        for course in courses
+    }
+
+
+def build_feed(user_id):
+    """
+    Пересобирает ленту пользователя по всем его подпискам,
+    новые подписки идут первыми. Строка ленты блокируется до чтения
+    подписок, поэтому параллельное обновление курса в лентах
+    не перезаписывает пересобранную ленту старыми данными.
+    """
+    with transaction.atomic():
+        Feed.objects.select_for_update().filter(user_id=user_id).exists()
+        subscriptions = list(
+            Subscription.objects.filter(user_id=user_id)
+            .order_by("-created_at")
+            .values_list("course_id", "created_at")
+        )
+        entries = get_feed_entries([course_id for course_id, _ in subscriptions])
+        items = [
+            {**entries[course_id], "subscribed_at": created_at.isoformat()}
+            for course_id, created_at in subscriptions
+            if course_id in entries
+        ]
+        feed, _ = Feed.objects.update_or_create(
+            user_id=user_id, defaults={"items": items}
+        )
+    return feed
+
+
+def refresh_course_in_feeds(course_id):
+    """
+    Обновляет запись курса в лентах подписчиков без пересборки лент целиком.
+    Запись курса строится один раз, ленты обновляются пачками: строки пачки
+    блокируются и перечитываются в транзакции, чтобы не затереть
+    параллельную пересборку ленты.
+    :return: количество обновленных лент
+    """
+    cache.delete(FEED_REFRESH_KEY.format(course_id=course_id))
+    entry = get_feed_entries([course_id]).get(course_id)
+    user_ids = list(
+        Feed.objects.filter(user__subscription__course_id=course_id).values_list(
+            "pk", flat=True
+        )
+    )
+
+    updated = 0
+    for start in range(0, len(user_ids), settings.FEED_BATCH_SIZE):
+        with transaction.atomic():
+            batch = list(
+                Feed.objects.select_for_update().filter(
+                    pk__in=user_ids[start:start + settings.FEED_BATCH_SIZE]
+                )
+            )
+            for feed in batch:
+                items = []
+                for item in feed.items:
+                    if item["id"] != course_id:
+                        items.append(item)
+                    elif entry is not None:
+                        items.append({**entry, "subscribed_at": item["subscribed_at"]})
+                feed.items = items
+                feed.updated_at = timezone.now()
+            Feed.objects.bulk_update(batch, ["items", "updated_at"])
+        updated += len(batch)
+    return updated
+
+
+def move_lesson(lesson, after=None):
+    """
+    Ставит урок после урока after того же курса, при after=None - в начало.
+    Новая позиция берется посередине между соседями, поэтому обычно
+    меняется одна строка. Если между соседями не осталось промежутка,
+    позиции всех уроков курса распределяются заново.
+    """
+    gap = settings.LESSON_RANK_GAP
+    with transaction.atomic():
+        # Перемещения внутри одного курса выполняются по очереди
+        Course.all_objects.select_for_update().filter(pk=lesson.course_id).exists()
+        siblings = Lesson.objects.filter(course_id=lesson.course_id).exclude(pk=lesson.pk)
+
+        if after is None:
+            previous_rank, following = None, siblings
+        else:
+            after.refresh_from_db(fields=["rank"])
+            previous_rank = after.rank
+            following = siblings.filter(
+                Q(rank__gt=after.rank) | Q(rank=after.rank, pk__gt=after.pk)
+            )
+        next_rank = following.values_list("rank", flat=True).first()
+
+        if next_rank is None:
+            if previous_rank is None:
+                return lesson
+            lesson.rank = previous_rank + gap
+        elif previous_rank is None:
+            lesson.rank = next_rank - gap
+        elif next_rank - previous_rank > 1:
+            lesson.rank = (previous_rank + next_rank) // 2
+        else:
+            return rebalance_lessons(lesson, after, siblings)
+        lesson.save()
+    return lesson
+
+
+def rebalance_lessons(lesson, after, siblings):
+    """
+    Заново расставляет позиции уроков курса через LESSON_RANK_GAP,
+    ставя урок после after
+    """
+    ordered = list(siblings.only("pk", "rank"))
+    position = 0 if after is None else [item.pk for item in ordered].index(after.pk) + 1
+    ordered.insert(position, lesson)
+    for index, item in enumerate(ordered, start=1):
+        item.rank = index * settings.LESSON_RANK_GAP
+    Lesson.objects.bulk_update(ordered, ["rank"])
+    return lesson
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from materials.models import Course, Lesson, Subscription
+from materials.services import FEED_REFRESH_KEY
+from materials.tasks import rebuild_feed, refresh_course_feeds
+
+# Поля, которые показываются в ленте или влияют на нее
+FEED_COURSE_FIELDS = {"title", "description", "preview", "deleted_at"}
+FEED_LESSON_FIELDS = {"course", "title", "video_link"}
+
+
+def schedule_feed_refresh(course_id):
+    """
+    Планирует обновление курса в лентах. Изменения курса за
+    FEED_REFRESH_DELAY секунд (например, удаление курса со всеми уроками)
+    объединяются в одну задачу.
+    """
+    if cache.add(
+        FEED_REFRESH_KEY.format(course_id=course_id), True, settings.FEED_REFRESH_DELAY
+    ):
+        refresh_course_feeds.apply_async(
+            (course_id,), countdown=settings.FEED_REFRESH_DELAY
+        )
+
+
+def subscription_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: rebuild_feed.delay(instance.user_id))
+
+
+def lesson_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not FEED_LESSON_FIELDS & set(update_fields):
+        return
+    course_ids = {instance.course_id}
+    if "course" in instance.changed_fields:
+        course_ids.add(instance.previous_values["course"])
+    for course_id in course_ids - {None}:
+        transaction.on_commit(
+            lambda course_id=course_id: schedule_feed_refresh(course_id)
+        )
+
+
+def course_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not FEED_COURSE_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(lambda: schedule_feed_refresh(instance.pk))
+
+
+def connect_signals():
+    for signal in (post_save, post_delete):
+        signal.connect(
+            subscription_changed, sender=Subscription, dispatch_uid="feed:subscription"
+        )
+        signal.connect(lesson_changed, sender=Lesson, dispatch_uid="feed:lesson")
+    post_save.connect(course_changed, sender=Course, dispatch_uid="feed:course")
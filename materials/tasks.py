@@ -1,17 +1,125 @@
+import logging
+from datetime import timedelta
+
 from config.settings import EMAIL_HOST_USER
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
 from celery import shared_task
 
+from config.purge import delete_in_batches
+from materials.models import Course, Lesson, Subscription
+from materials.services import (
+    NOTIFY_FIELDS,
+    build_feed,
+    pop_course_update,
+    refresh_course_in_feeds,
+)
+from users.models import Payments
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def send_information_about_update(subject, message, email=None, emails=None):
+    """
+    Рассылает письмо об обновлении курса пачке подписчиков
+    через одно SMTP-соединение
+    """
+    recipients = emails or [email]
+    messages = [
+        EmailMessage(subject, message, EMAIL_HOST_USER, [recipient])
+        for recipient in recipients
+    ]
+    with get_connection() as connection:
+        send_response = connection.send_messages(messages)
+
+    return send_response
+
+
+@shared_task
+def notify_course_update(course_id):
+    """
+    Одно сводное уведомление подписчикам обо всех изменениях курса
+    за окно COURSE_UPDATE_NOTIFY_WINDOW
+    :return: количество запущенных задач рассылки
+    """
+    changed = pop_course_update(course_id)
+    course = Course.objects.filter(pk=course_id).first()
+    if not changed or course is None:
+        return 0
+
+    emails = list(
+        Subscription.objects.filter(course=course).values_list("user__email", flat=True)
+    )
+    changes = ", ".join(NOTIFY_FIELDS[field] for field in changed)
+    batches = range(0, len(emails), settings.EMAIL_BATCH_SIZE)
+    for start in batches:
+        send_information_about_update.delay(
+            subject=f"Обновление курса {course.title}",
+            message=f"Курс {course.title} был обновлен ({changes}), проверьте на сайте",
+            emails=emails[start:start + settings.EMAIL_BATCH_SIZE],
+        )
+
+    return len(batches)
+
+
+@shared_task
+def rebuild_feed(user_id):
+    """
+    Пересобирает ленту пользователя после изменения его подписок
+    """
+    build_feed(user_id)
+
+
+@shared_task
+def refresh_course_feeds(course_id):
+    """
+    Обновляет курс в лентах подписчиков после изменения курса или его уроков
+    :return: количество обновленных лент
+    """
+    return refresh_course_in_feeds(course_id)
+
 
 @shared_task
-def send_information_about_update(subject, message, email):
-    subject = "Обновление курса"
-    message = f"{email} обновил свой курс"
-    send_response = send_mail(
-        subject=subject,
-        message=message,
-        from_email=EMAIL_HOST_USER,
-        recipient_list=[email],
+def purge_course(course_id):
+    """
+    Очистка помеченного на удаление курса: оплаты его уроков и курса,
+    подписки и уроки удаляются пачками по PURGE_BATCH_SIZE строк,
+    затем удаляется сам курс. Повторный запуск для уже очищенного
+    или восстановленного курса ничего не делает.
+    :return: количество удаленных строк
+    """
+    course = Course.all_objects.filter(pk=course_id, deleted_at__isnull=False).first()
+    if course is None:
+        return 0
+
+    batch_size = settings.PURGE_BATCH_SIZE
+    dependents = (
+        Payments.objects.filter(paid_lesson__course_id=course_id),
+        Payments.objects.filter(paid_course_id=course_id),
+        Subscription.objects.filter(course_id=course_id),
+        Lesson.objects.filter(course_id=course_id),
     )
+    deleted = sum(delete_in_batches(queryset, batch_size) for queryset in dependents)
+    deleted += course.delete()[0]
+
+    logger.info("purge_course %s: удалено строк %s", course_id, deleted)
+    return deleted
 
-    return send_response
\ No newline at end of file
+
+@shared_task
+def purge_deleted_courses():
+    """
+    Повторно запускает очистку курсов, помеченных на удаление больше
+    часа назад, на случай потерянных задач purge_course
+    :return: количество запущенных задач
+    """
+    course_ids = list(
+        Course.all_objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(hours=1)
+        ).values_list("pk", flat=True)
+    )
+    for course_id in course_ids:
+        purge_course.delay(course_id)
+    return len(course_ids)
@@ -1,12 +1,26 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from kombu.exceptions import OperationalError
 
 from rest_framework import status
 
 from rest_framework.test import APITestCase
 from rest_framework.test import APIClient
 
-from materials.models import Course, Lesson, Subscription
-from users.models import User
+from materials.models import Course, Feed, Lesson, Subscription
+from materials.tasks import notify_course_update, purge_course
+from users.models import Payments, User
 
 
 class LessonTestCase(APITestCase):
@@ -117,6 +131,254 @@ class LessonTestCase(APITestCase):
         self.assertEqual(data["results"][0]["owner"], self.user.pk)
 
 
+class CourseTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            email="testuser@example.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_course(self, title):
+        course = Course.objects.create(title=title, owner=self.user)
+        course.lessons.create(title=f"{title} lesson", owner=self.user)
+        return course
+
+    def test_course_list_query_count_does_not_grow(self):
+        url = reverse("materials:course-list")
+        subscribed = self.create_course("Course 1")
+        Subscription.objects.create(user=self.user, course=subscribed)
+
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(url)
+        for i in range(2, 6):
+            self.create_course(f"Course {i}")
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        data = response.json()
+        self.assertEqual(len(single), len(many))
+        self.assertEqual(data["count"], 5)
+        self.assertTrue(data["results"][0]["is_subscribed"])
+        self.assertFalse(data["results"][1]["is_subscribed"])
+        self.assertEqual(data["results"][0]["lessons_count"], 1)
+        self.assertEqual(len(data["results"][0]["lessons_list"]), 1)
+
+    @override_settings(PURGE_BATCH_SIZE=1, CELERY_TASK_ALWAYS_EAGER=True)
+    def test_destroy_hides_course_and_purges_dependents(self):
+        course = self.create_course("Course")
+        lesson = course.lessons.create(title="Second lesson")
+        kept = self.create_course("Kept")
+        Subscription.objects.create(user=self.user, course=course)
+        for paid in ({"paid_course": course}, {"paid_lesson": lesson}):
+            Payments.objects.create(
+                user=self.user, payment_count=100, payment_method="card", **paid
+            )
+
+        with mock.patch("materials.views.purge_course.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(
+                    reverse("materials:course-detail", args=(course.pk,))
+                )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        delay.assert_called_once_with(course.pk)
+        self.assertEqual(list(Course.objects.all()), [kept])
+        self.assertEqual(Lesson.objects.filter(course=course).count(), 2)
+        lessons = self.client.get(reverse("materials:lesson_list")).json()["results"]
+        self.assertEqual([item["course"] for item in lessons], [kept.pk])
+
+        self.assertEqual(purge_course(course.pk), 6)
+        self.assertFalse(Course.all_objects.filter(pk=course.pk).exists())
+        self.assertEqual(Lesson.objects.filter(course=course).count(), 0)
+        self.assertEqual(Payments.objects.count(), 0)
+        self.assertEqual(Subscription.objects.count(), 0)
+        self.assertEqual(purge_course(course.pk), 0)
+        self.assertEqual(purge_course(kept.pk), 0)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class CourseUpdateNotificationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="owner@example.com")
+        self.subscriber = User.objects.create(email="subscriber@example.com")
+        self.course = Course.objects.create(title="Course", owner=self.user)
+        Subscription.objects.create(user=self.subscriber, course=self.course)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("materials:course-detail", args=(self.course.pk,))
+
+    @mock.patch("materials.views.notify_course_update.apply_async")
+    def test_updates_are_coalesced(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                self.client.patch(self.url, {"title": f"Course v{i}"})
+            self.client.patch(self.url, {"description": "Новое описание"})
+
+        apply_async.assert_called_once()
+        self.assertEqual(notify_course_update(self.course.pk), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["subscriber@example.com"])
+        self.assertIn("Course v4", mail.outbox[0].subject)
+        self.assertIn("название, описание", mail.outbox[0].body)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {"title": "Course v5"})
+        self.assertEqual(apply_async.call_count, 2)
+
+    @mock.patch("materials.views.notify_course_update.apply_async")
+    def test_failed_enqueue_reopens_window(self, apply_async):
+        apply_async.side_effect = OperationalError("broker is down")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {"title": "Course v1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        apply_async.side_effect = None
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {"description": "Новое описание"})
+        self.assertEqual(apply_async.call_count, 2)
+        notify_course_update(self.course.pk)
+        self.assertIn("название, описание", mail.outbox[0].body)
+
+    @mock.patch("materials.views.notify_course_update.apply_async")
+    def test_invisible_update_is_skipped(self, apply_async):
+        self.client.patch(self.url, {"title": "Course"})
+
+        apply_async.assert_not_called()
+        self.assertEqual(notify_course_update(self.course.pk), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @mock.patch("materials.views.notify_course_update.apply_async")
+    def test_lesson_changes_notify_course(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("materials:lesson_create"),
+                {
+                    "title": "Lesson",
+                    "course": self.course.pk,
+                    "video_link": "https://www.youtube.com/watch?v=2T83JhAeC6U",
+                },
+            )
+
+        apply_async.assert_called_once_with((self.course.pk,), countdown=mock.ANY)
+        notify_course_update(self.course.pk)
+        self.assertIn("уроки", mail.outbox[0].body)
+
+
+@override_settings(LESSON_RANK_GAP=4)
+class LessonOrderTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="author@example.com")
+        self.course = Course.objects.create(title="Course", owner=self.user)
+        self.first, self.second, self.third = [
+            Lesson.objects.create(course=self.course, title=title, owner=self.user)
+            for title in ("first", "second", "third")
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def move(self, lesson, after):
+        return self.client.post(
+            reverse("materials:lesson_move", args=(lesson.pk,)),
+            {"after": after.pk if after else None},
+            format="json",
+        )
+
+    def titles(self):
+        response = self.client.get(reverse("materials:lesson_list"))
+        return [lesson["title"] for lesson in response.json()["results"]]
+
+    def test_new_lessons_are_appended(self):
+        self.assertEqual(
+            [lesson.rank for lesson in self.course.lessons.all()], [4, 8, 12]
+        )
+
+    def test_move_updates_single_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.move(self.third, self.first)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["rank"], 6)
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.titles(), ["first", "third", "second"])
+
+        self.move(self.second, None)
+        self.assertEqual(self.titles(), ["second", "first", "third"])
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        course = self.client.get(url)
+        self.assertEqual(
+            [lesson["title"] for lesson in course.json()["lessons_list"]],
+            ["second", "first", "third"],
+        )
+
+    def test_rebalances_when_no_gap_left(self):
+        Lesson.objects.filter(pk=self.second.pk).update(rank=5)
+
+        self.move(self.third, self.first)
+
+        self.assertEqual(self.titles(), ["first", "third", "second"])
+        self.assertEqual(
+            [lesson.rank for lesson in self.course.lessons.all()], [4, 8, 12]
+        )
+
+    def test_after_must_be_in_same_course(self):
+        other = Course.objects.create(title="Other", owner=self.user)
+        foreign = Lesson.objects.create(course=other, title="foreign", owner=self.user)
+
+        response = self.move(self.first, foreign)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.first.course = other
+        self.first.save()
+        self.assertEqual(self.first.rank, foreign.rank + 4)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class FeedTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="reader@example.com")
+        self.course = Course.objects.create(title="Course")
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f"Lesson {i}")
+            for i in range(7)
+        ]
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("materials:feed")
+
+    def test_feed_follows_subscriptions_and_lessons(self):
+        self.assertEqual(self.client.get(self.url).json()["items"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=self.user, course=self.course)
+
+        with CaptureQueriesContext(connection) as queries:
+            items = self.client.get(self.url).json()["items"]
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([item["id"] for item in items], [self.course.pk])
+        self.assertEqual(
+            [lesson["title"] for lesson in items[0]["lessons"]],
+            ["Lesson 6", "Lesson 5", "Lesson 4", "Lesson 3", "Lesson 2"],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[6].delete()
+            self.course.title = "Renamed"
+            self.course.save()
+        items = Feed.objects.get(user=self.user).items
+        self.assertEqual(items[0]["title"], "Renamed")
+        self.assertEqual(items[0]["lessons"][0]["title"], "Lesson 5")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(self.url).json()["items"], [])
+
+    def test_rebuild_feeds_command(self):
+        Subscription.objects.create(user=self.user, course=self.course)
+        Feed.objects.all().delete()
+
+        call_command("rebuild_feeds", "--sync", stdout=StringIO())
+
+        self.assertEqual(Feed.objects.get(user=self.user).items[0]["id"], self.course.pk)
+
+
 class SubscriptionTestCase(APITestCase):
 
     def setUp(self):
@@ -161,3 +423,89 @@ class SubscriptionTestCase(APITestCase):
 
         if not self.user.is_authenticated:
             self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ImportMaterialsTestCase(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title="Test Course")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.rejects = os.path.join(self.tmp_dir.name, "rejects.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_import_lessons_from_csv(self):
+        path = self.write(
+            "lessons.csv",
+            "course,title,video_link\n"
+            f"{self.course.pk},Intro,https://www.youtube.com/watch?v=2T83JhAeC6U\n"
+            f"{self.course.pk},Bad link,https://www.example.com/video.mp4\n"
+            "100,Missing course,\n"
+            f"{self.course.pk},No video,\n",
+        )
+
+        call_command(
+            "import_materials",
+            path,
+            model="lesson",
+            batch_size=2,
+            rejects=self.rejects,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            list(Lesson.objects.order_by("pk").values_list("title", flat=True)),
+            ["Intro", "No video"],
+        )
+        with open(self.rejects, encoding="utf-8") as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r["line"] for r in rejected), [3, 4])
+
+    @override_settings(LESSON_RANK_GAP=4)
+    def test_imported_lessons_are_appended(self):
+        existing = self.course.lessons.create(title="Existing")
+        other = Course.objects.create(title="Other Course")
+        path = self.write(
+            "lessons.jsonl",
+            f'{{"course": {self.course.pk}, "title": "First"}}\n'
+            f'{{"course": {other.pk}, "title": "Other"}}\n'
+            f'{{"course": {self.course.pk}, "title": "Second"}}\n',
+        )
+
+        call_command(
+            "import_materials", path, model="lesson", batch_size=2, stdout=StringIO()
+        )
+
+        self.assertEqual(
+            list(self.course.lessons.values_list("title", "rank")),
+            [("Existing", existing.rank), ("First", 8), ("Second", 12)],
+        )
+        self.assertEqual(other.lessons.get().rank, 4)
+
+    def test_import_courses_from_jsonl_rejects_non_objects(self):
+        path = self.write(
+            "courses.jsonl",
+            '{"title": "New Course", "description": "desc"}\n'
+            '["Not a course"]\n'
+            "42\n",
+        )
+
+        call_command(
+            "import_materials",
+            path,
+            model="course",
+            rejects=self.rejects,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Course.objects.count(), 2)
+        self.assertEqual(Course.objects.get(title="New Course").description, "desc")
+        with open(self.rejects, encoding="utf-8") as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r["line"] for r in rejected), [2, 3])
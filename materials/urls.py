@@ -4,9 +4,11 @@ from rest_framework.routers import DefaultRouter
 from materials.apps import MaterialsConfig
 from materials.views import (
     CourseViewSet,
+    FeedAPIView,
     LessonCreateAPIView,
     LessonDestroyAPIView,
     LessonListAPIView,
+    LessonMoveAPIView,
     LessonRetrieveAPIView,
     LessonUpdateAPIView,
     SubscriptionViewSet,
@@ -22,6 +24,7 @@ urlpatterns = [
     path(
         "materials/lesson/create/", LessonCreateAPIView.as_view(), name="lesson_create"
     ),
+    path("materials/feed/", FeedAPIView.as_view(), name="feed"),
     path("materials/lesson/", LessonListAPIView.as_view(), name="lesson_list"),
     path(
         "materials/lesson/<int:pk>/",
@@ -33,6 +36,11 @@ urlpatterns = [
         LessonUpdateAPIView.as_view(),
         name="lesson_update",
     ),
+    path(
+        "materials/lesson/<int:pk>/move/",
+        LessonMoveAPIView.as_view(),
+        name="lesson_move",
+    ),
     path(
         "materials/lesson/delete/<int:pk>/",
         LessonDestroyAPIView.as_view(),
@@ -1,14 +1,59 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
 from rest_framework import generics, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from kombu.exceptions import OperationalError
 
-from materials.models import Course, Lesson, Subscription
+from config.throttling import RedisScopedRateThrottle
+from materials.models import Course, Feed, Lesson, Subscription
 from materials.paginations import CustomPagination
-from materials.serializers import CourseSerializer, LessonSerializer
+from materials.serializers import (
+    CourseSerializer,
+    FeedSerializer,
+    LessonMoveSerializer,
+    LessonSerializer,
+)
 from users.permissions import IsModer, IsOwner
-from materials.tasks import send_information_about_update
+from materials.services import (
+    NOTIFY_FIELDS,
+    add_course_update,
+    cancel_course_update,
+    move_lesson,
+)
+from materials.tasks import notify_course_update, purge_course
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_course_notification(course_id, fields):
+    """
+    Планирует уведомление подписчиков об изменении курса.
+    Все изменения за окно COURSE_UPDATE_NOTIFY_WINDOW уходят одним письмом
+    после окончания окна. Задача ставится после фиксации транзакции, а если
+    брокер недоступен, окно закрывается, чтобы следующее изменение
+    запланировало уведомление заново.
+    """
+    if not fields or not add_course_update(course_id, fields):
+        return
+
+    def enqueue():
+        try:
+            notify_course_update.apply_async(
+                (course_id,), countdown=settings.COURSE_UPDATE_NOTIFY_WINDOW
+            )
+        except OperationalError:
+            cancel_course_update(course_id)
+            logger.exception("Не удалось запланировать уведомление о курсе %s", course_id)
+
+    transaction.on_commit(enqueue)
+
 
 class CourseViewSet(viewsets.ModelViewSet):
     """
@@ -18,6 +63,7 @@ class CourseViewSet(viewsets.ModelViewSet):
     serializer_class = CourseSerializer
     queryset = Course.objects.all()
     pagination_class = CustomPagination
+    query_budget = 8
 
     def get_permissions(self):
         """
@@ -46,27 +92,48 @@ class CourseViewSet(viewsets.ModelViewSet):
         Метод получения владельца курса
         :param serializer: на вход получаем сериализатор
         """
-        course = serializer.save()
-        course.owner = self.request.user
-        course.save()
+        serializer.save(owner=self.request.user)
 
     def perform_update(self, serializer):
+        """
+        Планирует уведомление подписчиков, если изменились видимые им поля курса
+        """
         instance = serializer.save()
-        subscribed_users = Subscription.objects.filter(course=instance).values_list('user__email', flat=True)
-
-        for user_email in subscribed_users:
-            send_information_about_update.delay(
-                subject=f"Обновление курса {instance.title}",
-                message=f"Курс {instance.title} был обновлен, проверьте на сайте",
-                email=user_email
-            )
-
+        schedule_course_notification(
+            instance.pk,
+            [field for field in NOTIFY_FIELDS if field in instance.changed_fields],
+        )
         return instance
 
+    def perform_destroy(self, instance):
+        """
+        Помечает курс удаленным и скрывает его, зависимые объекты
+        очищает задача purge_course после ответа
+        """
+        instance.deleted_at = timezone.now()
+        instance.save(update_fields=["deleted_at"])
+        transaction.on_commit(lambda: purge_course.delay(instance.pk))
+
 
     def get_queryset(self, *args, **kwargs):
+        """
+        Курсы владельца с количеством уроков, признаком подписки
+        и уроками, загруженными одним запросом
+        """
         queryset = super().get_queryset()
-        queryset = queryset.filter(owner=self.request.user.pk)
+        queryset = (
+            queryset.filter(owner=self.request.user.pk)
+            .annotate(
+                lessons_count=Count("lessons"),
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=self.request.user.pk, course=OuterRef("pk")
+                    )
+                ),
+            )
+            .prefetch_related("lessons")
+            .order_by("pk")
+        )
         return queryset
 
 
@@ -86,7 +153,7 @@ class LessonCreateAPIView(generics.CreateAPIView):
         :param serializer: на вход получаем сериализатор
         """
         lesson = serializer.save(owner=self.request.user)
-        lesson.save()
+        schedule_course_notification(lesson.course_id, ["lessons"])
 
 
 class LessonListAPIView(generics.ListAPIView):
@@ -94,9 +161,10 @@ class LessonListAPIView(generics.ListAPIView):
     Контроллер получения списка уроков
     """
     serializer_class = LessonSerializer
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.filter(course__deleted_at__isnull=True)
     permission_classes = (IsAuthenticated,)
     pagination_class = CustomPagination
+    query_budget = 4
 
     def get_queryset(self, *args, **kwargs):
         """
@@ -112,7 +180,8 @@ class LessonRetrieveAPIView(generics.RetrieveAPIView):
     Контроллер просмотра конкретного урока
     """
     serializer_class = LessonSerializer
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.filter(course__deleted_at__isnull=True)
+    query_budget = 5
     permission_classes = (
         IsAuthenticated,
         IsModer | IsOwner,
@@ -124,23 +193,80 @@ class LessonUpdateAPIView(generics.UpdateAPIView):
     Контроллер обновления конкретного урока
     """
     serializer_class = LessonSerializer
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.filter(course__deleted_at__isnull=True)
+    query_budget = 8
+    permission_classes = (
+        IsAuthenticated,
+        IsModer | IsOwner,
+    )
+    notify_fields = ("course", "title", "description", "video_link")
+
+    def perform_update(self, serializer):
+        """
+        Уведомляет подписчиков курса, если изменилось содержимое урока
+        """
+        lesson = serializer.save()
+        if lesson.changed_fields & set(self.notify_fields):
+            schedule_course_notification(lesson.course_id, ["lessons"])
+            if "course" in lesson.changed_fields:
+                schedule_course_notification(
+                    lesson.previous_values["course"], ["lessons"]
+                )
+
+
+class LessonMoveAPIView(generics.GenericAPIView):
+    """
+    Контроллер перемещения урока внутри курса
+    """
+    serializer_class = LessonMoveSerializer
+    queryset = Lesson.objects.filter(course__deleted_at__isnull=True)
     permission_classes = (
         IsAuthenticated,
         IsModer | IsOwner,
     )
 
+    def post(self, request, *args, **kwargs):
+        lesson = self.get_object()
+        serializer = self.get_serializer(
+            data=request.data,
+            context={**self.get_serializer_context(), "lesson": lesson},
+        )
+        serializer.is_valid(raise_exception=True)
+        move_lesson(lesson, serializer.validated_data["after"])
+        return Response(LessonSerializer(lesson, context={"request": request}).data)
+
 
 class LessonDestroyAPIView(generics.DestroyAPIView):
     """
     Контроллер удаления конкретного урока
     """
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.filter(course__deleted_at__isnull=True)
     permission_classes = (
         IsAuthenticated,
         ~IsModer | IsOwner,
     )
 
+    def perform_destroy(self, instance):
+        course_id = instance.course_id
+        instance.delete()
+        schedule_course_notification(course_id, ["lessons"])
+
+
+class FeedAPIView(generics.RetrieveAPIView):
+    """
+    Контроллер ленты подписок: курсы, на которые подписан пользователь,
+    с последними уроками. Лента читается готовой одним запросом,
+    у пользователя без подписок ленты нет и она пустая.
+    """
+
+    serializer_class = FeedSerializer
+    permission_classes = (IsAuthenticated,)
+    query_budget = 2
+
+    def get_object(self):
+        feed = Feed.objects.filter(user=self.request.user).first()
+        return feed or Feed(user=self.request.user)
+
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
     """
@@ -152,6 +278,17 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         ~IsModer,
     )
     queryset = Subscription.objects.all()
+    throttle_classes = (RedisScopedRateThrottle,)
+    throttle_scope = "subscription"
+
+    def get_throttles(self):
+        """
+        Ограничение частоты только для создания и удаления подписки:
+        POST переключает подписку, DELETE удаляет ее
+        """
+        if self.request.method not in ("POST", "DELETE"):
+            return []
+        return super().get_throttles()
 
     def post(self, *args, **kwargs):
         """
@@ -1,4 +1,6 @@
 from django.contrib import admin
+
+from config.paginations import EstimatedCountPaginator
 from users.models import User, Payments
 
 
@@ -11,6 +13,9 @@ class UserAdmin(admin.ModelAdmin):
         "phone_number",
         "city",
     )
+    search_fields = ("email",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
@@ -27,8 +32,7 @@ class PaymentsAdmin(admin.ModelAdmin):
         "payment_count",
         "payment_method",
     )
-
-
-from django.contrib import admin
-
-# Register your models here.
+    list_select_related = ("user", "paid_course", "paid_lesson")
+    autocomplete_fields = ("user", "paid_course", "paid_lesson")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
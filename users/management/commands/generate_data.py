@@ -0,0 +1,183 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from materials.importers import batched
+from materials.models import Course, Lesson, Subscription
+from users.models import Payments, User
+
+EMAIL_DOMAIN = "loadtest.local"
+VIDEO_LINK = "https://www.youtube.com/watch?v=2T83JhAeC6U"
+CITIES = ("Алматы", "Астана", "Москва", "Казань", "Новосибирск", None)
+WORDS = (
+    "Python",
+    "Django",
+    "REST",
+    "SQL",
+    "Celery",
+    "Redis",
+    "Docker",
+    "Git",
+    "основы",
+    "практика",
+    "алгоритмы",
+    "тестирование",
+    "архитектура",
+    "API",
+)
+
+
+class Command(BaseCommand):
+    """
+    Генерация синтетических данных для нагрузочного тестирования.
+
+    Пользователи создаются с почтой userN@loadtest.local и общим паролем,
+    модераторы - moderN@loadtest.local. При одинаковом --seed набор данных
+    воспроизводится, что позволяет сравнивать прогоны нагрузочного теста.
+    """
+
+    help = "Генерация синтетических пользователей, курсов, уроков, подписок и платежей"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--moderators", type=int, default=10)
+        parser.add_argument("--courses", type=int, default=200)
+        parser.add_argument("--lessons-per-course", type=int, default=10)
+        parser.add_argument("--subscriptions-per-user", type=int, default=3)
+        parser.add_argument("--payments-per-user", type=int, default=2)
+        parser.add_argument("--password", default="loadtest")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить ранее сгенерированные данные перед генерацией",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.monotonic()
+
+        if options["clear"]:
+            self.clear()
+
+        with transaction.atomic():
+            password = make_password(options["password"])
+            users = self.create_users("user", options["users"], password)
+            moderators = self.create_users("moder", options["moderators"], password)
+            group, _ = Group.objects.get_or_create(name="moderator")
+            self.bulk_create(
+                User.groups.through,
+                [
+                    User.groups.through(user_id=moderator.pk, group_id=group.pk)
+                    for moderator in moderators
+                ],
+            )
+
+            courses = self.bulk_create(
+                Course,
+                [
+                    Course(
+                        title=f"{self.title()} #{i}",
+                        description=self.text(),
+                        owner=self.random.choice(users) if users else None,
+                    )
+                    for i in range(options["courses"])
+                ],
+            )
+            lessons = self.bulk_create(
+                Lesson,
+                [
+                    Lesson(
+                        course=course,
+                        title=f"{self.title()} #{i}",
+                        description=self.text(),
+                        video_link=VIDEO_LINK,
+                        owner=course.owner,
+                        rank=(i + 1) * settings.LESSON_RANK_GAP,
+                    )
+                    for course in courses
+                    for i in range(options["lessons_per_course"])
+                ],
+            )
+            self.create_subscriptions(users, courses, options["subscriptions_per_user"])
+            self.create_payments(users, courses, lessons, options["payments_per_user"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано пользователей: {len(users)}, модераторов: {len(moderators)}, "
+                f"курсов: {len(courses)}, уроков: {len(lessons)} "
+                f"за {time.monotonic() - started:.1f} с"
+            )
+        )
+
+    def clear(self):
+        generated = User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+        Course.objects.filter(owner__in=generated).delete()
+        generated.delete()
+
+    def bulk_create(self, model, objects):
+        created = []
+        for batch in batched(objects, self.batch_size):
+            created.extend(model.objects.bulk_create(batch))
+        return created
+
+    def create_users(self, prefix, count, password):
+        return self.bulk_create(
+            User,
+            [
+                User(
+                    email=f"{prefix}{i}@{EMAIL_DOMAIN}",
+                    password=password,
+                    first_name=f"{prefix.capitalize()}{i}",
+                    city=self.random.choice(CITIES),
+                    is_active=True,
+                )
+                for i in range(count)
+            ],
+        )
+
+    def create_subscriptions(self, users, courses, per_user):
+        if not courses:
+            return
+        subscriptions = []
+        for user in users:
+            for course in self.random.sample(courses, min(per_user, len(courses))):
+                subscriptions.append(Subscription(user=user, course=course))
+        self.bulk_create(Subscription, subscriptions)
+
+    def create_payments(self, users, courses, lessons, per_user):
+        if not courses:
+            return
+        payments = []
+        for user in users:
+            for _ in range(per_user):
+                paid_lesson = lessons and self.random.random() < 0.5
+                payments.append(
+                    Payments(
+                        user=user,
+                        paid_course=(
+                            None if paid_lesson else self.random.choice(courses)
+                        ),
+                        paid_lesson=(
+                            self.random.choice(lessons) if paid_lesson else None
+                        ),
+                        payment_count=self.random.randint(1, 100) * 100,
+                        payment_method=self.random.choice(
+                            ("Оплата картой", "Оплата наличными")
+                        ),
+                    )
+                )
+        self.bulk_create(Payments, payments)
+
+    def title(self):
+        return " ".join(self.random.sample(WORDS, 3)).capitalize()
+
+    def text(self):
+        return " ".join(self.random.choices(WORDS, k=20))
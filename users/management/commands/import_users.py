@@ -0,0 +1,278 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from materials.importers import (
+    RejectWriter,
+    batched,
+    detect_format,
+    iter_rows,
+    open_source,
+)
+from materials.models import Course, Lesson
+from users.models import Payments, User
+
+USER_FIELDS = ("email", "first_name", "last_name", "phone_number", "city")
+PAYMENT_FIELDS = ("payment_count", "payment_method", "status")
+
+
+def text(row, name):
+    """
+    Значение поля строкой без пробелов по краям. В JSONL значения могут быть
+    числами, списками и т. п., они приводятся к строке и проверяются как есть.
+    """
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def init_worker():
+    """
+    Подготовка Django в дочернем процессе пула хеширования паролей
+    """
+    django.setup()
+
+
+class Command(BaseCommand):
+    """
+    Массовый импорт пользователей и их платежей из CSV/JSONL.
+
+    Пароли хешируются в пуле процессов, записи вставляются пачками через
+    bulk_create, курсы, уроки и пользователи платежей ищутся по словарям
+    в памяти, а не запросом на каждую строку.
+    """
+
+    help = "Импорт пользователей и платежей из CSV/JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", help='Файл пользователей, "-" для stdin')
+        parser.add_argument("--payments", help="Файл платежей")
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Количество процессов для хеширования паролей",
+        )
+        parser.add_argument("--rejects", help="Файл для отклоненных строк (JSONL)")
+
+    def handle(self, *args, **options):
+        if not options["users"] and not options["payments"]:
+            raise CommandError("Укажите --users и/или --payments")
+        if options["batch_size"] < 1:
+            raise CommandError("Размер пачки должен быть положительным")
+
+        self.batch_size = options["batch_size"]
+        self.user_ids = {}
+
+        with RejectWriter(options["rejects"]) as rejects:
+            if options["users"]:
+                self.run(
+                    "Пользователи",
+                    options["users"],
+                    options["format"],
+                    rejects,
+                    lambda rows: self.import_users(rows, rejects, options["workers"]),
+                )
+            if options["payments"]:
+                self.run(
+                    "Платежи",
+                    options["payments"],
+                    options["format"],
+                    rejects,
+                    lambda rows: self.import_payments(rows, rejects),
+                )
+
+    def run(self, label, path, fmt, rejects, importer):
+        started = time.monotonic()
+        rejected = rejects.count
+        with open_source(path) as stream:
+            imported = importer(iter_rows(stream, detect_format(path, fmt)))
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{label}: импортировано {imported}, отклонено {rejects.count - rejected}, "
+                f"{imported / elapsed if elapsed else imported:.0f} строк/с"
+            )
+        )
+
+    def import_users(self, rows, rejects, workers):
+        imported = 0
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+        try:
+            for batch in batched(rows, self.batch_size):
+                users, passwords = self.validate_users(batch, rejects)
+                if executor is not None:
+                    chunksize = max(1, len(passwords) // (workers * 4))
+                    hashes = executor.map(make_password, passwords, chunksize=chunksize)
+                else:
+                    hashes = map(make_password, passwords)
+                for user, password in zip(users, hashes):
+                    user.password = password
+
+                with transaction.atomic():
+                    User.objects.bulk_create(users)
+                self.user_ids.update(
+                    User.objects.filter(
+                        email__in=[user.email for user in users]
+                    ).values_list("email", "pk")
+                )
+                imported += len(users)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return imported
+
+    def validate_users(self, batch, rejects):
+        candidates = []
+        for line_num, row in batch:
+            if "_error" in row:
+                rejects.write(line_num, row, [f"Некорректный JSON: {row['_error']}"])
+                continue
+            values = {}
+            for name in USER_FIELDS:
+                value = text(row, name)
+                values[name] = value or (
+                    None if User._meta.get_field(name).null else ""
+                )
+            user = User(
+                is_active=str(row.get("is_active", "true")).lower() in ("1", "true"),
+                **values,
+            )
+            errors = []
+            try:
+                user.clean_fields(exclude=["password", "avatar", "last_login"])
+            except ValidationError as error:
+                errors.extend(
+                    f"{name}: {message}"
+                    for name, messages in error.message_dict.items()
+                    for message in messages
+                )
+            if errors:
+                rejects.write(line_num, row, errors)
+            else:
+                candidates.append((line_num, row, user))
+
+        existing = set(
+            User.objects.filter(
+                email__in=[user.email for _, _, user in candidates]
+            ).values_list("email", flat=True)
+        )
+        users, passwords = [], []
+        for line_num, row, user in candidates:
+            if user.email in existing:
+                rejects.write(
+                    line_num, row, ["email: пользователь с такой почтой уже существует"]
+                )
+                continue
+            existing.add(user.email)
+            users.append(user)
+            passwords.append(text(row, "password") or None)
+        return users, passwords
+
+    def import_payments(self, rows, rejects):
+        course_ids = set(Course.objects.values_list("pk", flat=True))
+        lesson_ids = set(Lesson.objects.values_list("pk", flat=True))
+        imported = 0
+
+        for batch in batched(rows, self.batch_size):
+            self.resolve_emails(text(row, "email") for _, row in batch)
+
+            payments, paid_at = [], []
+            for line_num, row in batch:
+                payment, data, errors = self.build_payment(row, course_ids, lesson_ids)
+                if errors:
+                    rejects.write(line_num, row, errors)
+                else:
+                    payments.append(payment)
+                    paid_at.append(data)
+
+            with transaction.atomic():
+                Payments.objects.bulk_create(payments)
+                # Поле data заполняется auto_now_add, историческую дату возвращаем отдельно
+                dated = []
+                for payment, data in zip(payments, paid_at):
+                    if data is not None:
+                        payment.data = data
+                        dated.append(payment)
+                Payments.objects.bulk_update(dated, ["data"])
+            imported += len(payments)
+        return imported
+
+    def resolve_emails(self, emails):
+        """
+        Дополняет словарь почта -> id пользователями, импортированными ранее
+        """
+        missing = {email for email in emails if email and email not in self.user_ids}
+        if missing:
+            self.user_ids.update(
+                User.objects.filter(email__in=missing).values_list("email", "pk")
+            )
+
+    def build_payment(self, row, course_ids, lesson_ids):
+        if "_error" in row:
+            return None, None, [f"Некорректный JSON: {row['_error']}"]
+        errors = []
+
+        email = text(row, "email")
+        user_id = self.user_ids.get(email)
+        if user_id is None:
+            errors.append(f"user: пользователь {email!r} не найден")
+
+        related = {}
+        for name, known_ids in (
+            ("paid_course", course_ids),
+            ("paid_lesson", lesson_ids),
+        ):
+            value = row.get(name)
+            if value in ("", None):
+                related[name] = None
+                continue
+            try:
+                related[name] = int(value)
+            except (TypeError, ValueError):
+                errors.append(f"{name}: ожидается целое число, получено {value!r}")
+                continue
+            if related[name] not in known_ids:
+                errors.append(f"{name}: объект с id {value} не найден")
+
+        data = None
+        if raw_data := text(row, "data"):
+            try:
+                data = parse_datetime(raw_data)
+            except ValueError:
+                data = None
+            if data is None:
+                errors.append(f"data: некорректная дата {raw_data!r}")
+            elif timezone.is_naive(data):
+                data = timezone.make_aware(data)
+
+        if errors:
+            return None, None, errors
+
+        payment = Payments(
+            user_id=user_id,
+            paid_course_id=related["paid_course"],
+            paid_lesson_id=related["paid_lesson"],
+            **{
+                name: None if row.get(name) in (None, "") else row[name]
+                for name in PAYMENT_FIELDS
+            },
+        )
+        try:
+            payment.clean_fields(exclude=["user", "paid_course", "paid_lesson", "data"])
+            payment.clean()
+        except ValidationError as error:
+            errors.extend(error.messages)
+        return payment, data, errors
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from redis import RedisError
+
+from users.services import record_last_seen
+
+logger = logging.getLogger(__name__)
+
+
+class LastSeenMiddleware:
+    """
+    Фиксирует время последней активности авторизованного пользователя.
+    Пользователь, аутентифицированный по JWT внутри DRF-представления, также
+    попадает в request.user. Запись идет в Redis не чаще одного раза
+    в LAST_SEEN_INTERVAL секунд на пользователя в рамках процесса,
+    в базу отметки переносит задача users.tasks.flush_last_seen.
+    Отключается настройкой LAST_SEEN_ENABLED.
+    """
+
+    max_tracked = 10000
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.recorded = {}
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        user = getattr(request, "user", None)
+        if settings.LAST_SEEN_ENABLED and user is not None and user.is_authenticated:
+            self.touch(user.pk)
+
+        return response
+
+    def touch(self, user_id):
+        now = time.monotonic()
+        if now - self.recorded.get(user_id, float("-inf")) < settings.LAST_SEEN_INTERVAL:
+            return
+
+        if len(self.recorded) >= self.max_tracked:
+            self.recorded.clear()
+        self.recorded[user_id] = now
+
+        try:
+            record_last_seen(user_id, timezone.now())
+        except RedisError:
+            logger.warning("Не удалось записать отметку активности", exc_info=True)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0003_payments_status"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["last_login"], name="users_user_last_login_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_user_last_login_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="deletion_requested_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Аккаунт отключен и удаляется задачей users.tasks.purge_user",
+                null=True,
+                verbose_name="Дата запроса удаления",
+            ),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.exceptions import ValidationError
 
+from config.models import DirtyFieldsMixin
 from materials.models import Course, Lesson
 
 NULLABLE = {"blank": True, "null": True}
@@ -29,6 +30,11 @@ class User(AbstractUser):
         **NULLABLE,
         help_text="Аватар",
     )
+    deletion_requested_at = models.DateTimeField(
+        verbose_name="Дата запроса удаления",
+        **NULLABLE,
+        help_text="Аккаунт отключен и удаляется задачей users.tasks.purge_user",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -36,12 +42,15 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "пользователь"
         verbose_name_plural = "пользователи"
+        indexes = [
+            models.Index(fields=["last_login"], name="users_user_last_login_idx"),
+        ]
 
     def __str__(self):
         return self.email
 
 
-class Payments(models.Model):
+class Payments(DirtyFieldsMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -81,7 +90,8 @@ class Payments(models.Model):
             raise ValidationError("Нельзя указывать одновременно курс и урок.")
 
     def save(self, *args, **kwargs):
-        self.full_clean()
+        if self._state.adding or self.get_dirty_fields():
+            self.full_clean()
         super().save(*args, **kwargs)
 
     class Meta:
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from config.renditions import RenditionsField
 from users.models import User, Payments
 
 
@@ -22,6 +23,7 @@ class UserSerializer(serializers.ModelSerializer):
     """
 
     payments_history = PaymentSerializer(many=True, source="payment", read_only=True)
+    avatar_renditions = RenditionsField(source="avatar")
 
     class Meta:
         model = User
@@ -30,6 +32,8 @@ class UserSerializer(serializers.ModelSerializer):
             "email",
             "phone_number",
             "city",
+            "avatar",
+            "avatar_renditions",
             "first_name",
             "last_name",
             "is_active",
@@ -41,6 +45,8 @@ class UserSerializer(serializers.ModelSerializer):
 class UserProfileSerializer(serializers.ModelSerializer):
     """Сериализатор для обновления профиля"""
 
+    avatar_renditions = RenditionsField(source="avatar")
+
     class Meta:
         model = User
         fields = '__all__'
@@ -1,15 +1,46 @@
-import stripe
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from types import SimpleNamespace
 
-from config.settings import STRIPE_SECRET_KEY
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
 
-stripe.api_key = STRIPE_SECRET_KEY
+from config.redis_client import get_redis
+
+
+@lru_cache
+def get_stripe():
+    """
+    Модуль stripe с ключом API. Импортируется при первом обращении к платежам,
+    чтобы не замедлять запуск веб-процессов и воркеров.
+    """
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+def create_stripe_product(name):
+    """
+    Создание продукта для оплаты.
+    """
+    if settings.STRIPE_STUB:
+        return f"prod_stub_{uuid.uuid4().hex}"
+
+    product = get_stripe().Product.create(name=name)
+    return product.id
 
 
 def create_stripe_price(product_id, payment_count):
     """
     Создание цены для курса.
     """
-    price = stripe.Price.create(
+    if settings.STRIPE_STUB:
+        return f"price_stub_{uuid.uuid4().hex}"
+
+    price = get_stripe().Price.create(
         unit_amount=int(payment_count) * 100,
         currency="rub",
         product=product_id,
@@ -21,10 +52,114 @@ def create_stripe_session(price_id):
     """
     Создание сессии для оплаты.
     """
+    if settings.STRIPE_STUB:
+        session_id = f"cs_stub_{uuid.uuid4().hex}"
+        return SimpleNamespace(
+            id=session_id, url=f"http://127.0.0.1:8000/stub-checkout/{session_id}"
+        )
 
-    session = stripe.checkout.Session.create(
+    session = get_stripe().checkout.Session.create(
         success_url="http://127.0.0.1:8000/",
         line_items=[{"price": price_id, "quantity": 1}],
         mode="payment",
     )
-    return session
\ No newline at end of file
+    return session
+
+
+def retrieve_stripe_session(session_id):
+    """
+    Получение сессии оплаты для проверки статуса платежа.
+    """
+    if settings.STRIPE_STUB:
+        return SimpleNamespace(id=session_id, payment_status="paid")
+
+    return get_stripe().checkout.Session.retrieve(session_id)
+
+
+LAST_SEEN_KEY = "users:last_seen"
+
+
+def record_last_seen(user_id, seen_at):
+    """
+    Отметка последней активности пользователя в Redis.
+    Повторные отметки перезаписывают одно поле хеша, поэтому между выгрузками
+    в базу на пользователя хранится ровно одна запись.
+    """
+    get_redis().hset(LAST_SEEN_KEY, user_id, seen_at.timestamp())
+
+
+def pop_last_seen():
+    """
+    Атомарно забирает накопленные отметки активности из Redis.
+    :return: словарь {id пользователя: время последней активности}
+    """
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.hgetall(LAST_SEEN_KEY)
+    pipe.delete(LAST_SEEN_KEY)
+    seen, _ = pipe.execute()
+    return {
+        int(user_id): datetime.fromtimestamp(float(timestamp), tz=timezone.utc)
+        for user_id, timestamp in seen.items()
+    }
+
+
+ACCOUNT_DELETION_KEY = "users:deletion:{user_id}"
+ACCOUNT_DELETION_SALT = "users.deletion"
+ACCOUNT_DELETION_STEPS = ("courses", "lessons", "payments", "subscriptions", "account")
+
+
+def get_deletion_progress(user_id):
+    """
+    Ход удаления аккаунта: статус (pending, running, done)
+    и количество обработанных строк по шагам
+    :return: словарь или None, если удаление не запрашивалось
+    """
+    return cache.get(ACCOUNT_DELETION_KEY.format(user_id=user_id))
+
+
+def save_deletion_progress(user_id, progress):
+    progress["updated_at"] = datetime.now(timezone.utc).isoformat()
+    cache.set(
+        ACCOUNT_DELETION_KEY.format(user_id=user_id),
+        progress,
+        settings.ACCOUNT_DELETION_PROGRESS_TTL,
+    )
+
+
+def start_deletion_progress(user_id):
+    """
+    Начальное состояние удаления. Уже идущее удаление не сбрасывается.
+    """
+    progress = get_deletion_progress(user_id)
+    if progress is None or progress["status"] == "done":
+        progress = {
+            "status": "pending",
+            "steps": {step: 0 for step in ACCOUNT_DELETION_STEPS},
+        }
+        save_deletion_progress(user_id, progress)
+    return progress
+
+
+def make_deletion_token(user_id):
+    """
+    Подписанный токен для просмотра хода удаления. JWT отключенного
+    аккаунта уже не принимается, поэтому ход удаления открывается по токену.
+    """
+    return signing.dumps(user_id, salt=ACCOUNT_DELETION_SALT)
+
+
+def check_deletion_token(token, user_id):
+    """
+    :return: True, если токен выдан при удалении аккаунта user_id и не истек
+    """
+    try:
+        return (
+            signing.loads(
+                token,
+                salt=ACCOUNT_DELETION_SALT,
+                max_age=settings.ACCOUNT_DELETION_PROGRESS_TTL,
+            )
+            == user_id
+        )
+    except signing.BadSignature:
+        return False
@@ -1,12 +1,167 @@
+import logging
+import time
 from datetime import timedelta
 
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
-from users.models import User
+from config.purge import delete_in_batches, update_in_batches
+from materials.models import Course, Feed, Lesson, Subscription
+from users.models import Payments, User
+from users.services import (
+    get_deletion_progress,
+    pop_last_seen,
+    save_deletion_progress,
+    start_deletion_progress,
+)
 from celery import shared_task
 
+logger = logging.getLogger(__name__)
+
+CHECK_ACTIVITY_CHECKPOINT_KEY = "users:check_activity:checkpoint"
+
 
 @shared_task
 def check_activity():
-    inactive_users = User.objects.filter(last_login__lt=timezone.now() - timedelta(days=30))
-    inactive_users.update(is_active=False)
\ No newline at end of file
+    """
+    Деактивация пользователей, которые не входили в приложение
+    дольше USER_INACTIVITY_DAYS дней.
+
+    Задача инкрементальная: просматривается только окно пользователей,
+    пересекших порог с момента прошлого запуска (индекс по last_login).
+    Пользователи обрабатываются пачками по первичному ключу, после каждой
+    пачки в кэше сохраняется контрольная точка, поэтому прерванный запуск
+    продолжается с места остановки.
+    :return: количество деактивированных пользователей, пачек и время работы
+    """
+    started = time.monotonic()
+    batch_size = settings.CHECK_ACTIVITY_BATCH_SIZE
+
+    checkpoint = cache.get(CHECK_ACTIVITY_CHECKPOINT_KEY) or {}
+    if checkpoint.get("until") is None:
+        checkpoint = {
+            "since": checkpoint.get("since"),
+            "until": timezone.now() - timedelta(days=settings.USER_INACTIVITY_DAYS),
+            "last_pk": 0,
+        }
+
+    window = User.objects.filter(is_active=True, last_login__lt=checkpoint["until"])
+    if checkpoint["since"] is not None:
+        window = window.filter(last_login__gte=checkpoint["since"])
+
+    processed = 0
+    batches = 0
+    while True:
+        batch = list(
+            window.filter(pk__gt=checkpoint["last_pk"])
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            break
+        processed += window.filter(pk__in=batch).update(is_active=False)
+        batches += 1
+        checkpoint["last_pk"] = batch[-1]
+        cache.set(CHECK_ACTIVITY_CHECKPOINT_KEY, checkpoint, timeout=None)
+
+    cache.set(
+        CHECK_ACTIVITY_CHECKPOINT_KEY, {"since": checkpoint["until"]}, timeout=None
+    )
+
+    report = {
+        "processed": processed,
+        "batches": batches,
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+    logger.info("check_activity: %s", report)
+    return report
+
+
+@shared_task
+def flush_last_seen():
+    """
+    Перенос накопленных в Redis отметок активности в поле User.last_login
+    одним bulk_update.
+    :return: количество обновленных пользователей
+    """
+    seen = pop_last_seen()
+    if not seen:
+        return 0
+
+    users = []
+    for user in User.objects.filter(pk__in=seen).only("pk", "last_login"):
+        if user.last_login is None or user.last_login < seen[user.pk]:
+            user.last_login = seen[user.pk]
+            users.append(user)
+
+    User.objects.bulk_update(users, ["last_login"])
+    return len(users)
+
+
+@shared_task
+def purge_user(user_id):
+    """
+    Удаление отключенного аккаунта: владение курсами и уроками снимается,
+    оплаты, подписки и лента удаляются пачками по PURGE_BATCH_SIZE строк,
+    затем удаляется сам пользователь. Ход удаления после каждой пачки
+    сохраняется в кэше (users.services.get_deletion_progress).
+    Повторный запуск продолжает с оставшихся строк, для уже удаленного
+    аккаунта ничего не делает.
+    :return: ход удаления
+    """
+    user = User.objects.filter(pk=user_id, deletion_requested_at__isnull=False).first()
+    if user is None:
+        return get_deletion_progress(user_id)
+
+    progress = start_deletion_progress(user_id)
+    progress["status"] = "running"
+    save_deletion_progress(user_id, progress)
+
+    def track(step):
+        def advance(count):
+            progress["steps"][step] += count
+            save_deletion_progress(user_id, progress)
+
+        return advance
+
+    batch_size = settings.PURGE_BATCH_SIZE
+    update_in_batches(
+        Course.all_objects.filter(owner_id=user_id),
+        batch_size,
+        track("courses"),
+        owner=None,
+    )
+    update_in_batches(
+        Lesson.objects.filter(owner_id=user_id), batch_size, track("lessons"), owner=None
+    )
+    delete_in_batches(
+        Payments.objects.filter(user_id=user_id), batch_size, track("payments")
+    )
+    delete_in_batches(
+        Subscription.objects.filter(user_id=user_id), batch_size, track("subscriptions")
+    )
+    Feed.objects.filter(user_id=user_id).delete()
+    track("account")(user.delete()[0])
+
+    progress["status"] = "done"
+    save_deletion_progress(user_id, progress)
+    logger.info("purge_user %s: %s", user_id, progress["steps"])
+    return progress
+
+
+@shared_task
+def purge_deleted_users():
+    """
+    Повторно запускает удаление аккаунтов, запрошенное больше часа назад,
+    на случай потерянных задач purge_user
+    :return: количество запущенных задач
+    """
+    user_ids = list(
+        User.objects.filter(
+            deletion_requested_at__lt=timezone.now() - timedelta(hours=1)
+        ).values_list("pk", flat=True)
+    )
+    for user_id in user_ids:
+        purge_user.delay(user_id)
+    return len(user_ids)
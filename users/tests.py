@@ -1,3 +1,294 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from materials.models import Course, Lesson, Subscription
+from users.models import Payments, User
+from users.services import LAST_SEEN_KEY
+from users.tasks import (
+    CHECK_ACTIVITY_CHECKPOINT_KEY,
+    check_activity,
+    flush_last_seen,
+    purge_user,
+)
+
+
+class CheckActivityTestCase(TestCase):
+    def setUp(self):
+        cache.delete(CHECK_ACTIVITY_CHECKPOINT_KEY)
+        now = timezone.now()
+        self.active_user = User.objects.create(
+            email="active@example.com", last_login=now - timedelta(days=1)
+        )
+        self.inactive_users = [
+            User.objects.create(
+                email=f"inactive{i}@example.com",
+                last_login=now - timedelta(days=31 + i),
+            )
+            for i in range(5)
+        ]
+        self.never_logged_in = User.objects.create(email="new@example.com")
+
+    def tearDown(self):
+        cache.delete(CHECK_ACTIVITY_CHECKPOINT_KEY)
+
+    @override_settings(CHECK_ACTIVITY_BATCH_SIZE=2)
+    def test_deactivates_inactive_users_in_batches(self):
+        report = check_activity()
+
+        self.assertEqual(report["processed"], 5)
+        self.assertEqual(report["batches"], 3)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 5)
+        self.active_user.refresh_from_db()
+        self.never_logged_in.refresh_from_db()
+        self.assertTrue(self.active_user.is_active)
+        self.assertTrue(self.never_logged_in.is_active)
+
+    def test_next_run_scans_only_new_window(self):
+        check_activity()
+        reactivated = self.inactive_users[0]
+        User.objects.filter(pk=reactivated.pk).update(is_active=True)
+
+        report = check_activity()
+
+        # Пользователь остался за пределами нового окна, повторно не сканируется
+        self.assertEqual(report["processed"], 0)
+        reactivated.refresh_from_db()
+        self.assertTrue(reactivated.is_active)
+
+    def test_resumes_from_checkpoint(self):
+        until = timezone.now() - timedelta(days=30)
+        cache.set(
+            CHECK_ACTIVITY_CHECKPOINT_KEY,
+            {"since": None, "until": until, "last_pk": self.inactive_users[2].pk},
+            timeout=None,
+        )
+
+        report = check_activity()
+
+        self.assertEqual(report["processed"], 2)
+        self.assertEqual(
+            cache.get(CHECK_ACTIVITY_CHECKPOINT_KEY), {"since": until}
+        )
+
+
+class AccountDeletionTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="author@example.com")
+        self.courses = [
+            Course.objects.create(title=f"Course {i}", owner=self.user) for i in range(3)
+        ]
+        for course in self.courses:
+            course.lessons.create(title="Lesson", owner=self.user)
+            Subscription.objects.create(user=self.user, course=course)
+            Payments.objects.create(
+                user=self.user, paid_course=course, payment_count=100, payment_method="card"
+            )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("users:users_delete", args=(self.user.pk,))
+
+    @override_settings(PURGE_BATCH_SIZE=2)
+    def test_deactivates_at_once_and_purges_in_batches(self):
+        with mock.patch("users.views.purge_user.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(self.url)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "pending")
+        delay.assert_called_once_with(self.user.pk)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deletion_requested_at)
+
+        progress = purge_user(self.user.pk)
+
+        self.assertEqual(progress["status"], "done")
+        self.assertEqual(
+            progress["steps"],
+            {"courses": 3, "lessons": 3, "payments": 3, "subscriptions": 3, "account": 1},
+        )
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Course.objects.filter(owner__isnull=True).count(), 3)
+        self.assertEqual(Lesson.objects.filter(owner__isnull=True).count(), 3)
+        self.assertEqual(Payments.objects.count(), 0)
+        status_url = response.json()["status_url"]
+        self.assertEqual(self.client.get(status_url).json(), progress)
+        self.assertEqual(purge_user(self.user.pk), progress)
+
+    def test_progress_is_readable_only_by_requester(self):
+        self.client.force_authenticate(user=None)
+        other = User.objects.create(email="other@example.com")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        with mock.patch("users.views.purge_user.delay"):
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()["status_url"]
+
+        self.assertEqual(self.client.get(status_url).json()["status"], "pending")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(f"{self.url}?token=forged").status_code, 404)
+        self.assertEqual(self.client.delete(self.url).status_code, 401)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}"
+        )
+        other_url = reverse("users:users_delete", args=(other.pk,))
+        token = status_url.split("token=")[1]
+        self.assertEqual(self.client.get(f"{other_url}?token={token}").status_code, 404)
+        self.client.credentials()
+        self.assertEqual(self.client.get(status_url).status_code, 200)
+
+    def test_purge_ignores_accounts_without_request(self):
+        self.assertIsNone(purge_user(self.user.pk))
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+
+@override_settings(LAST_SEEN_ENABLED=True)
+class LastSeenTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="testuser@example.com")
+        self.client.force_authenticate(user=self.user)
+
+    @mock.patch("users.services.get_redis")
+    def test_requests_are_coalesced(self, get_redis):
+        url = reverse("users:payment_list")
+        self.client.get(url)
+        self.client.get(url)
+
+        hset = get_redis.return_value.hset
+        hset.assert_called_once()
+        self.assertEqual(hset.call_args.args[:2], (LAST_SEEN_KEY, self.user.pk))
+
+    @mock.patch("users.services.get_redis")
+    def test_redis_errors_are_logged(self, get_redis):
+        get_redis.return_value.hset.side_effect = RedisError
+        with self.assertLogs("users.middleware", "WARNING"):
+            response = self.client.get(reverse("users:payment_list"))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(LAST_SEEN_ENABLED=False)
+    @mock.patch("users.services.get_redis")
+    def test_disabled(self, get_redis):
+        self.client.get(reverse("users:payment_list"))
+        get_redis.assert_not_called()
+
+    def test_flush_updates_last_login(self):
+        seen_at = timezone.now()
+        stale_user = User.objects.create(
+            email="stale@example.com", last_login=seen_at + timedelta(minutes=1)
+        )
+        with mock.patch(
+            "users.tasks.pop_last_seen",
+            return_value={self.user.pk: seen_at, stale_user.pk: seen_at},
+        ):
+            updated = flush_last_seen()
+
+        self.assertEqual(updated, 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, seen_at)
+
+
+class ImportUsersTestCase(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title="Test Course")
+        self.lesson = self.course.lessons.create(title="test_lesson")
+        User.objects.create(email="existing@example.com")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_import_users_and_payments(self):
+        users = self.write(
+            "users.csv",
+            "email,password,city\n"
+            "first@example.com,secret1,Almaty\n"
+            "second@example.com,secret2,\n"
+            "existing@example.com,secret3,\n"
+            "not-an-email,secret4,\n",
+        )
+        payments = self.write(
+            "payments.jsonl",
+            '{"email": "first@example.com", "paid_course": %d, "payment_count": 100, '
+            '"payment_method": "card", "data": "2024-01-02T10:00:00+00:00"}\n'
+            '{"email": "existing@example.com", "paid_lesson": %d, "payment_count": 0, '
+            '"payment_method": "cash"}\n'
+            '{"email": "second@example.com", "paid_course": 100, "payment_count": 10, '
+            '"payment_method": "cash"}\n'
+            '{"email": "second@example.com", "paid_course": %d, "paid_lesson": %d, '
+            '"payment_count": 10, "payment_method": "cash"}\n'
+            % (self.course.pk, self.lesson.pk, self.course.pk, self.lesson.pk),
+        )
+
+        call_command(
+            "import_users",
+            users=users,
+            payments=payments,
+            workers=2,
+            stdout=StringIO(),
+        )
+
+        first = User.objects.get(email="first@example.com")
+        self.assertTrue(first.check_password("secret1"))
+        self.assertEqual(first.city, "Almaty")
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Payments.objects.count(), 2)
+        payment = Payments.objects.get(user=first)
+        self.assertEqual(payment.paid_course, self.course)
+        self.assertEqual(payment.data.year, 2024)
+        self.assertEqual(
+            Payments.objects.get(user__email="existing@example.com").payment_count, 0
+        )
+
+    def test_non_string_json_values_are_coerced_or_rejected(self):
+        rejects = os.path.join(self.tmp_dir.name, "rejects.jsonl")
+        users = self.write(
+            "users.jsonl",
+            '{"email": "numbers@example.com", "password": 12345, "city": 42}\n'
+            '{"email": ["list@example.com"], "password": "secret"}\n'
+            "not json\n",
+        )
+        payments = self.write(
+            "payments.jsonl",
+            '{"email": "numbers@example.com", "paid_course": %d, '
+            '"payment_count": 100, "payment_method": "card", "data": true}\n'
+            '{"email": 7, "paid_course": %d, "payment_count": 10, '
+            '"payment_method": "cash"}\n' % (self.course.pk, self.course.pk),
+        )
+
+        call_command(
+            "import_users",
+            users=users,
+            payments=payments,
+            workers=1,
+            rejects=rejects,
+            stdout=StringIO(),
+        )
+
+        user = User.objects.get(email="numbers@example.com")
+        self.assertTrue(user.check_password("12345"))
+        self.assertEqual(user.city, "42")
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Payments.objects.count(), 0)
+        with open(rejects, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 4)
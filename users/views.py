@@ -1,23 +1,33 @@
 import os
 
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
 
-import stripe
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
+from config.throttling import RedisScopedRateThrottle
 from materials.models import Course
 from users.models import User, Payments
 from users.serializers import UserSerializer, PaymentSerializer, UserProfileSerializer
-from users.services import create_stripe_price, create_stripe_session
-from config.settings import STRIPE_SECRET_KEY
+from users.services import (
+    create_stripe_price,
+    create_stripe_product,
+    check_deletion_token,
+    create_stripe_session,
+    get_deletion_progress,
+    make_deletion_token,
+    retrieve_stripe_session,
+    start_deletion_progress,
+)
+from users.tasks import purge_user
 
 
-stripe.api_key = STRIPE_SECRET_KEY
-
 class UserCreateAPIView(generics.CreateAPIView):
     """
     Контроллер регистрации пользователя.
@@ -28,9 +38,8 @@ class UserCreateAPIView(generics.CreateAPIView):
     permission_classes = (AllowAny,)
 
     def perform_create(self, serializer):
-        user = serializer.save(is_active=True)
-        user.set_password(user.password)
-        user.save()
+        password = make_password(serializer.validated_data.get("password", ""))
+        serializer.save(is_active=True, password=password)
 
 
 class UserListAPIView(generics.ListAPIView):
@@ -39,8 +48,11 @@ class UserListAPIView(generics.ListAPIView):
     """
 
     serializer_class = UserSerializer
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("payment")
     permission_classes = (AllowAny,)
+    throttle_classes = (RedisScopedRateThrottle,)
+    throttle_scope = "users_list"
+    query_budget = 3
 
 
 class UserRetrieveAPIView(generics.RetrieveAPIView):
@@ -49,7 +61,8 @@ class UserRetrieveAPIView(generics.RetrieveAPIView):
     """
 
     serializer_class = UserSerializer
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("payment")
+    query_budget = 4
 
     def get_serializer_class(self):
         if self.request.user.pk == self.kwargs["pk"]:
@@ -73,10 +86,47 @@ class UserUpdateAPIView(generics.UpdateAPIView):
 class UserDestroyAPIView(generics.DestroyAPIView):
     """
     Контроллер удаления информации о конкретном пользователе.
+    Аккаунт сразу отключается, данные удаляет задача purge_user.
+    Ответ содержит status_url с подписанным токеном, по которому
+    ход удаления возвращается на GET без аутентификации.
     """
 
     queryset = User.objects.all()
 
+    def get_authenticators(self):
+        if self.request.method == "GET":
+            return []
+        return super().get_authenticators()
+
+    def get_permissions(self):
+        if self.request.method == "GET":
+            return [AllowAny()]
+        return super().get_permissions()
+
+    def get(self, request, *args, **kwargs):
+        token = request.query_params.get("token", "")
+        if not check_deletion_token(token, self.kwargs["pk"]):
+            raise Http404
+        progress = get_deletion_progress(self.kwargs["pk"])
+        if progress is None:
+            raise Http404
+        return Response(progress)
+
+    def destroy(self, request, *args, **kwargs):
+        user = self.get_object()
+        if user.deletion_requested_at is None:
+            user.is_active = False
+            user.deletion_requested_at = timezone.now()
+            user.save(update_fields=["is_active", "deletion_requested_at"])
+        progress = start_deletion_progress(user.pk)
+        transaction.on_commit(lambda: purge_user.delay(user.pk))
+        status_url = request.build_absolute_uri(
+            f"{request.path}?token={make_deletion_token(user.pk)}"
+        )
+        return Response(
+            {**progress, "status_url": status_url}, status=status.HTTP_202_ACCEPTED
+        )
+
 
 class PaymentListAPIView(generics.ListCreateAPIView):
     """
@@ -93,6 +143,7 @@ class PaymentListAPIView(generics.ListCreateAPIView):
         "paid_lesson",
     )
     ordering_fields = ("data",)
+    query_budget = 3
 
 
     def get_queryset(self):
@@ -109,10 +160,13 @@ class PaymentCreateAPIView(CreateAPIView):
 
     serializer_class = PaymentSerializer
     queryset = Payments.objects.all()
+    throttle_classes = (RedisScopedRateThrottle,)
+    throttle_scope = "payment_create"
 
     def perform_create(self, serializer):
         payment = serializer.save(user=self.request.user)
-        product_id = stripe.Product.create(name=f"Payment for {payment.paid_course.title or payment.paid_lesson.title}")
+        paid_object = payment.paid_course or payment.paid_lesson
+        product_id = create_stripe_product(f"Payment for {paid_object.title}")
         price_id = create_stripe_price(product_id, payment.payment_count)
         session = create_stripe_session(price_id)
         payment.payment_id = price_id
@@ -130,18 +184,19 @@ class PaymentRetrieveAPIView(generics.RetrieveAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return Payments.objects.filter(user=self.request.user)
+
     def get(self, *args, **kwargs):
-        payment_data = super().get(*args, **kwargs).data
-        payment = get_object_or_404(Payments, pk=self.kwargs["pk"])
+        payment = self.get_object()
 
-        check_out = stripe.checkout.Session.retrieve(
-            payment.tokens,
-        )
+        check_out = retrieve_stripe_session(payment.tokens)
 
+        # Статус записывается, только если изменился
         payment.status = check_out.payment_status
         payment.save()
 
         return Response(data={
-            "Payment": payment_data,
+            "Payment": self.get_serializer(payment).data,
             "Статус платежа": check_out.payment_status
         })